@@ -227,6 +227,27 @@ map.on('load', function() {
 	var treeLat;
 	var treeLon;
 
+	//true loads <tree_id>.bin point clouds written by writeDeckBinary (py/treeCloudTools.py) instead of <tree_id>.json
+	var binaryPointClouds = false;
+	var pointCloudExtension = binaryPointClouds ? '.bin' : '.json';
+	//binary files are a 32 byte header (magic, version, point count, column count, trunk lon, trunk lat as float64)
+	//then float32 rows of east and north offsets from the trunk in meters, height in meters, intensity, return number, number of returns
+	//fetched once per tree and shared by the tree layer, the shadow layers and the overlay stats
+	var binaryPointCloudRequests = {};
+	function loadBinaryPointCloud(url) {
+		if (!(url in binaryPointCloudRequests)) {
+			binaryPointCloudRequests[url] = fetch(url).then(response => response.arrayBuffer()).then(function(buffer) {
+				var header = new DataView(buffer, 0, 32);
+				var count = header.getUint32(8, true);
+				var columns = header.getUint32(12, true);
+				var values = new Float32Array(buffer, 32, count * columns);
+				//positions go to the gpu as they are, the other columns are read by index in the accessors
+				return { length: count, columns: columns, values: values, attributes: { getPosition: { value: values, size: 3, stride: columns * 4, offset: 0 } } };
+				});
+			};
+		return binaryPointCloudRequests[url];
+		};
+
 	function shadow(zipcode,species,treeID,treeLat,treeLon,az,amp,darkness,name,bool) {
 		//build paths to tree point cloud
 		var pointCloudFile = ' https://tree-folio.s3.amazonaws.com/folio/folio/';
@@ -237,7 +258,7 @@ map.on('load', function() {
 		var pointCloudFile = pointCloudFile.concat(species);
 		var pointCloudFile = pointCloudFile.concat('/');
 		var pointCloudFile = pointCloudFile.concat(treeID);
-		var pointCloudFile = pointCloudFile.concat('.json');
+		var pointCloudFile = pointCloudFile.concat(pointCloudExtension);
 
 		var shadow = 'shadow'.concat(treeID);
 		//math to project point cloud to ground to create shadows
@@ -252,14 +273,25 @@ map.on('load', function() {
 		//name each shadow layer uniquely so it does not comflict
 		var name = 'shadow'.concat(name);
 
+		var layerData = pointCloudFile;
+		var getPosition = d => [ d[0]/3.28 + (d[2]/tanAmp*(sinAz)), d[1]/3.28 + (d[2]/tanAmp*(cosAz)), 0.1 ]; //for Z position d[2]*0
+		var getColor = d => [ 255-100*(darkness*darkness)*(d[5]-d[4]), 255-100*(darkness*darkness)*(d[5]-d[4]), 255-100*(darkness*darkness)*(d[5]-d[4]), 150*(darkness*darkness)*(d[5]-d[4]) ];
+		if (binaryPointClouds) {
+			//binary rows are read by index, offsets are already in meters
+			//the shared cloud is passed on without its getPosition attribute, deck.gl 8+ would draw that instead of the projected positions below
+			layerData = loadBinaryPointCloud(pointCloudFile).then(cloud => ({ length: cloud.length, columns: cloud.columns, values: cloud.values }));
+			getPosition = (d, {index, data}) => { var i = index*data.columns; var v = data.values; return [ v[i] + (v[i+2]/tanAmp*(sinAz)), v[i+1] + (v[i+2]/tanAmp*(cosAz)), 0.1 ]; };
+			getColor = (d, {index, data}) => { var i = index*data.columns; var returns = data.values[i+5]-data.values[i+4]; return [ 255-100*(darkness*darkness)*returns, 255-100*(darkness*darkness)*returns, 255-100*(darkness*darkness)*returns, 150*(darkness*darkness)*returns ]; };
+			};
+
 		map.addLayer(new MapboxLayer({
 	    	id: name,
 	    	type: PointCloudLayer,
-	    	data: pointCloudFile,
+	    	data: layerData,
 	    	coordinateSystem: COORDINATE_SYSTEM.METER_OFFSETS,
     		coordinateOrigin: [treeLon, treeLat],
-	    	getPosition: d => [ d[0]/3.28 + (d[2]/tanAmp*(sinAz)), d[1]/3.28 + (d[2]/tanAmp*(cosAz)), 0.1 ], //for Z position d[2]*0
-	    	getColor: d => [ 255-100*(darkness*darkness)*(d[5]-d[4]), 255-100*(darkness*darkness)*(d[5]-d[4]), 255-100*(darkness*darkness)*(d[5]-d[4]), 150*(darkness*darkness)*(d[5]-d[4]) ],
+	    	getPosition: getPosition,
+	    	getColor: getColor,
 	    	sizeUnits: 'feet',
 	    	pointSize: 2,
 	    	//opacity: darkness*3,
@@ -309,16 +341,27 @@ map.on('load', function() {
 		var pointCloudFile = pointCloudFile.concat(species);
 		var pointCloudFile = pointCloudFile.concat('/');
 		var pointCloudFile = pointCloudFile.concat(treeID);
-		var pointCloudFile = pointCloudFile.concat('.json');
+		var pointCloudFile = pointCloudFile.concat(pointCloudExtension);
+		//only the clicked tree's binary point cloud is kept
+		binaryPointCloudRequests = {};
+		var layerData = pointCloudFile;
+		var getPosition = d => [d[0]/3.28, d[1]/3.28, (d[2])];
+		var getColor = d => [ d[3]*255, (d[3]*125+(d[3]*225*(d[5]-d[4]+1))), d[3]*255, 100*(d[5]-d[4])+100 ];
+		if (binaryPointClouds) {
+			//deck.gl 8+ takes positions straight from the binary getPosition attribute and skips this accessor, 7 reads rows by index
+			layerData = loadBinaryPointCloud(pointCloudFile);
+			getPosition = (d, {index, data}) => { var i = index*data.columns; return [ data.values[i], data.values[i+1], data.values[i+2] ]; };
+			getColor = (d, {index, data}) => { var i = index*data.columns; var intens = data.values[i+3]; var returns = data.values[i+5]-data.values[i+4]; return [ intens*255, (intens*125+(intens*225*(returns+1))), intens*255, 100*returns+100 ]; };
+			};
 		//add the selected tree point cloud layer 
 		map.addLayer(new MapboxLayer({
 	    	id: 'tree',
 	    	type: PointCloudLayer,
-	    	data: pointCloudFile,
+	    	data: layerData,
 	    	coordinateSystem: COORDINATE_SYSTEM.METER_OFFSETS,
     		coordinateOrigin: [treeLon,treeLat],
-	    	getPosition: d => [d[0]/3.28, d[1]/3.28, (d[2])],
-	    	getColor: d => [ d[3]*255, (d[3]*125+(d[3]*225*(d[5]-d[4]+1))), d[3]*255, 100*(d[5]-d[4])+100 ],
+	    	getPosition: getPosition,
+	    	getColor: getColor,
 	    	sizeUnits: 'feet',
 	    	pointSize: 3,
 	    	opacity: 0.75,
@@ -347,7 +390,16 @@ map.on('load', function() {
 		/////////////////////////////////////////////////////////////////////////////////////////////////////////////////////
 		//parse xyz json to get tree stats, to update parameters in the html overlay
 
-		jQuery.when(jQuery.getJSON(pointCloudFile)).done( function(treeTable) {
+		//binary rows are turned back into the json row layout, offsets in feet, so the stats below read both the same way
+		var treeTableRequest = binaryPointClouds ? loadBinaryPointCloud(pointCloudFile).then(function(cloud) {
+			var rows = [];
+			for (var i = 0; i < cloud.length; i++) {
+				var j = i*cloud.columns;
+				rows.push([ cloud.values[j]*3.28, cloud.values[j+1]*3.28, cloud.values[j+2] ]);
+				};
+			return rows;
+			}) : jQuery.getJSON(pointCloudFile);
+		jQuery.when(treeTableRequest).done( function(treeTable) {
 			//console.log(treeTable);
 			var max = 0;
 			var min = 10;
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:05:41 2026
+
+@author: joe
+"""
+
+# coordinate conversions between the census/lidar state plane (EPSG 2263) and lat/lon (EPSG 4326)
+# building a pyproj Transformer costs milliseconds, far more than transforming a few thousand points,
+# so each (source, destination) pair is built once per process and reused
+
+from pyproj import Transformer
+
+# Transformers this process has built, keyed by (source, destination) EPSG numbers
+transformers = {}
+
+#
+
+def getTransformer(sourceEpsg,destinationEpsg):
+    '''
+
+    Parameters:
+        sourceEpsg : EPSG number of the input coordinates, e.g. 2263
+        destinationEpsg : EPSG number of the output coordinates, e.g. 4326
+
+    Returns:
+        pyproj Transformer, built on first use and cached after, axis order as each CRS defines it (lat first for 4326)
+
+    '''
+    key = (int(sourceEpsg), int(destinationEpsg))
+    if key not in transformers:
+        transformers[key] = Transformer.from_crs("epsg:{}".format(key[0]), "epsg:{}".format(key[1]))
+    return transformers[key]
+
+#
+
+def transformCoords(a,b,sourceEpsg,destinationEpsg):
+    # both output axes from one call, scalars stay scalars and arrays or Pandas series come back as float arrays
+    return getTransformer(sourceEpsg,destinationEpsg).transform(a, b)
+
+#
+
+def convertCoords(x,y):
+    '''
+
+    Parameters:
+        x : cartesian x coordinate(s) in state plane coordinate system for NY, long island (EPSG 2263), scalar or array
+        y : cartesian y coordinate(s) in the same system
+
+    Returns:
+        lat : latitude in WGS 1984 (EPSG 4326)
+        lon : longitude in WGS 1984 (EPSG 4326)
+
+    '''
+    lat, lon = transformCoords(x, y, 2263, 4326)
+    return lat, lon
+
+#
+
+def convertLatLon(lat,lon,epsgNumber=2263):
+    #translate from geojson CRS (WGS 1984) to the .las CRS, state plane feet unless another EPSG number is given
+    x, y = transformCoords(lat, lon, 4326, epsgNumber)
+    return x, y
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 18:37:14 2026
+
+@author: joe
+"""
+
+# Entwine Point Tile (EPT) datasets like the USGS lidar in the public usgs-lidar-public bucket, https://entwine.io/en/latest/entwine-point-tile.html
+# node keys come from the dataset's ept-hierarchy json instead of listing the bucket, and nodes download on a thread pool
+# through one pooled S3 client per process, a source can also be a local folder with the bucket's layout (for tests and mirrors)
+
+import os
+import json
+import math
+import itertools
+import shutil
+import numpy as np
+import pandas as pd
+import boto3
+from botocore import UNSIGNED
+from botocore.client import Config
+from concurrent.futures import ThreadPoolExecutor
+from lasTools import LIDAR_COLUMNS, LIDAR_DTYPES
+
+EPT_BUCKET = 'usgs-lidar-public'
+
+# connections kept open to S3, at least as many as download threads
+S3_POOL_SIZE = 32
+
+# S3 clients this process has made, keyed by connection pool size, boto3 clients are safe to share between threads
+s3Clients = {}
+
+# ept.json and hierarchy of every source this process has read, keyed by (bucket or folder, prefix)
+eptCache = {}
+
+#
+
+def eptSource(prefix,bucket=EPT_BUCKET,root=None):
+    '''
+
+    Parameters:
+        prefix : dataset folder, e.g. 'NY_NewYorkCity/', for available datasets: https://usgs.entwine.io/
+        bucket : S3 bucket holding the dataset, read without credentials
+        root : local folder to read instead of the bucket, laid out like it (root/prefix/ept.json, root/prefix/ept-data/...)
+
+    Returns:
+        source : dict handle for the other functions here
+
+    '''
+    source = {'prefix':prefix, 'bucket':bucket, 'root':root}
+    return source
+
+#
+
+def getS3Client(poolSize=S3_POOL_SIZE):
+    # unsigned client for public buckets, connection pool sized for the download threads
+    if poolSize not in s3Clients:
+        s3Clients[poolSize] = boto3.client('s3', config=Config(signature_version=UNSIGNED, max_pool_connections=poolSize))
+    return s3Clients[poolSize]
+
+#
+
+def readSourceJson(source,key):
+    # json file at key (e.g. 'ept.json') under the source's prefix
+    if source['root'] is not None:
+        with open(os.path.join(source['root'], source['prefix'] + key)) as f:
+            return json.load(f)
+    return json.load(getS3Client().get_object(Bucket=source['bucket'], Key=source['prefix'] + key)['Body'])
+
+#
+
+def downloadSourceFile(source,key,path):
+    # copied next to path and renamed, so an interrupted download never leaves a truncated file that looks cached
+    scratch = path + '.part'
+    if source['root'] is not None:
+        shutil.copyfile(os.path.join(source['root'], source['prefix'] + key), scratch)
+    else:
+        getS3Client().download_file(source['bucket'], source['prefix'] + key, scratch)
+    os.replace(scratch, path)
+    return path
+
+#
+
+def sourceCache(source):
+    cacheKey = (source['root'] or source['bucket'], source['prefix'])
+    if cacheKey not in eptCache:
+        eptCache[cacheKey] = {}
+    return eptCache[cacheKey]
+
+#
+
+def eptMetadata(source):
+    # the dataset's ept.json (bounds, srs, span ...), read once per process
+    cache = sourceCache(source)
+    if 'metadata' not in cache:
+        cache['metadata'] = readSourceJson(source,'ept.json')
+    return cache['metadata']
+
+#
+
+def eptHierarchy(source,threads=16):
+    '''
+
+    Parameters:
+        source : dict from eptSource
+        threads : hierarchy pages read at once
+
+    Returns:
+        hierarchy : dict of 'depth-x-y-z' node key to point count for every node in the dataset,
+            read once per process, pages the root page points to (count -1) are followed level by level
+
+    '''
+    cache = sourceCache(source)
+    if 'hierarchy' in cache:
+        return cache['hierarchy']
+    hierarchy = {}
+    pages = ['0-0-0-0']
+    if source['root'] is None:
+        # made before the threads share it
+        getS3Client()
+    with ThreadPoolExecutor(threads) as executor:
+        while len(pages) > 0:
+            nextPages = []
+            for page in executor.map(lambda page: readSourceJson(source,'ept-hierarchy/{}.json'.format(page)), pages):
+                for key, count in page.items():
+                    if count == -1:
+                        nextPages.append(key)
+                    else:
+                        hierarchy[key] = count
+            pages = nextPages
+    cache['hierarchy'] = hierarchy
+    return hierarchy
+
+#
+
+def parseNodeKey(key):
+    depth, x, y, z = (int(part) for part in key.split('-'))
+    return depth, x, y, z
+
+#
+
+def nodeBounds(source,key):
+    # [xmin,ymin,zmin,xmax,ymax,zmax] of a node, the dataset's cubic bounds halved at every depth
+    [xmin,ymin,zmin,xmax,ymax,zmax] = eptMetadata(source)['bounds']
+    depth, x, y, z = parseNodeKey(key)
+    sx, sy, sz = ( xmax - xmin ) / 2 ** depth, ( ymax - ymin ) / 2 ** depth, ( zmax - zmin ) / 2 ** depth
+    return [xmin + x * sx, ymin + y * sy, zmin + z * sz, xmin + ( x + 1 ) * sx, ymin + ( y + 1 ) * sy, zmin + ( z + 1 ) * sz]
+
+#
+
+def depthForResolution(source,resolution):
+    # shallowest depth whose nodes are sampled at least this finely, a node holds about span points along each axis
+    metadata = eptMetadata(source)
+    [xmin,ymin,zmin,xmax,ymax,zmax] = metadata['bounds']
+    return max(int(math.ceil(math.log2(( xmax - xmin ) / ( metadata['span'] * resolution )))), 0)
+
+#
+
+def boxNodes(source,box,maxDepth=9):
+    '''
+
+    Parameters:
+        source : dict from eptSource
+        box : [xmin,ymin,zmin,xmax,ymax,zmax] query box in the dataset's srs, zmin/zmax may be -inf/inf
+        maxDepth : deepest octree level used, e.g. from depthForResolution
+
+    Returns:
+        keys of exactly the nodes with points that intersect the box, from the root down to maxDepth, sorted by depth then x, y, z,
+        the octree is walked from the root into the children that exist and intersect, so the work follows the result
+
+    '''
+    hierarchy = eptHierarchy(source)
+    [bxmin,bymin,bzmin,bxmax,bymax,bzmax] = box
+    keys = []
+    level = [key for key in ['0-0-0-0'] if key in hierarchy]
+    while len(level) > 0:
+        keys.extend(key for key in level if hierarchy[key] > 0)
+        children = []
+        for key in level:
+            depth, x, y, z = parseNodeKey(key)
+            if depth == maxDepth:
+                continue
+            for i, j, k in itertools.product((0,1), repeat=3):
+                child = '{}-{}-{}-{}'.format(depth + 1, 2 * x + i, 2 * y + j, 2 * z + k)
+                if child not in hierarchy:
+                    continue
+                [xmin,ymin,zmin,xmax,ymax,zmax] = nodeBounds(source,child)
+                if xmin <= bxmax and xmax >= bxmin and ymin <= bymax and ymax >= bymin and zmin <= bzmax and zmax >= bzmin:
+                    children.append(child)
+        level = children
+    return sorted(keys, key=parseNodeKey)
+
+#
+
+def fetchNodes(source,keys,folder,threads=16):
+    '''
+
+    Parameters:
+        source : dict from eptSource
+        keys : node keys to fetch, e.g. from boxNodes
+        folder : local folder the .laz nodes are kept in, nodes already there aren't fetched again
+        threads : downloads at once, each through the same pooled client
+
+    Returns:
+        local .laz path of every key, in the order of keys
+
+    '''
+    os.makedirs(folder, exist_ok=True)
+    paths = [os.path.join(folder,'{}.laz'.format(key)) for key in keys]
+    missing = [[key, path] for key, path in zip(keys, paths) if not os.path.exists(path)]
+    if len(missing) > 0:
+        if source['root'] is None:
+            getS3Client()
+        with ThreadPoolExecutor(threads) as executor:
+            # list() so a failed download raises here
+            list(executor.map(lambda keyPath: downloadSourceFile(source,'ept-data/{}.laz'.format(keyPath[0]),keyPath[1]), missing))
+    return paths
+
+#
+
+def nodeZStats(node):
+    # [mean, std] of a node's Z, nan for nodes under two points
+    Z = node['Z'].to_numpy()
+    return [Z.mean(), Z.std(ddof=1)] if len(Z) > 1 else [np.nan, np.nan]
+
+#
+
+def cropNode(node,boxes):
+    '''
+
+    Parameters:
+        node : Pandas dataframe of every point of one node, see lasToDataFrame
+        boxes : list of [xmin,ymin,zmin,xmax,ymax,zmax] boxes in the node's coordinates, zmin/zmax may be -inf/inf
+
+    Returns:
+        one crop per box, a dict of column arrays of the node's points inside it in the node's order,
+        with several boxes the points are sorted by X once and each box only masks its slice of that order
+
+    '''
+    X, Y, Z = node['X'].to_numpy(), node['Y'].to_numpy(), node['Z'].to_numpy()
+    if len(boxes) > 1:
+        order = np.argsort(X, kind='stable')
+        sortedX = X[order]
+    crops = []
+    for [xmin,ymin,zmin,xmax,ymax,zmax] in boxes:
+        if len(boxes) > 1:
+            candidates = order[np.searchsorted(sortedX, xmin, side='left'):np.searchsorted(sortedX, xmax, side='right')]
+            candidates = np.sort(candidates[( Y[candidates] >= ymin ) & ( Y[candidates] <= ymax ) & ( Z[candidates] >= zmin ) & ( Z[candidates] <= zmax )])
+        else:
+            candidates = np.flatnonzero(( X >= xmin ) & ( X <= xmax ) & ( Y >= ymin ) & ( Y <= ymax ) & ( Z >= zmin ) & ( Z <= zmax ))
+        crops.append({column:node[column].to_numpy()[candidates] for column in node.columns})
+    return crops
+
+#
+
+def mergeCrops(crops):
+    # one dataframe from node crops, each column allocated once at the final size and filled crop by crop
+    if len(crops) == 0:
+        return pd.DataFrame({column:np.zeros(0, dtype=dtype) for column, dtype in zip(LIDAR_COLUMNS,LIDAR_DTYPES)})
+    total = sum(len(crop['X']) for crop in crops)
+    columns = {column:np.empty(total, dtype=values.dtype) for column, values in crops[0].items()}
+    start = 0
+    for crop in crops:
+        stop = start + len(crop['X'])
+        for column in columns:
+            columns[column][start:stop] = crop[column]
+        start = stop
+    return pd.DataFrame(columns, copy=False)
+
+#
+
+def readNodesInBoxes(nodes,nodeBoxes,boxes):
+    '''
+
+    Parameters:
+        nodes : iterable of Pandas dataframes, each every point of one node (see lasToDataFrame), e.g. readCachedNodes
+        nodeBoxes : for each node, the positions in boxes of the boxes it's read for
+        boxes : [xmin,ymin,zmin,xmax,ymax,zmax] boxes in the nodes' coordinates, zmin/zmax may be -inf/inf
+
+    Returns:
+        frames : one Pandas dataframe per box of the points of its nodes inside it,
+            each node is read once and cropped for every box that needs it as soon as it's read, then the crops of a box
+            are copied once into arrays sized for its result, so memory follows the points returned plus one node
+        zStats : [mean, std] of each node's Z before cropping, in the order of nodes
+
+    '''
+    crops = [[] for box in boxes]
+    zStats = []
+    for node, positions in zip(nodes, nodeBoxes):
+        zStats.append(nodeZStats(node))
+        for position, crop in zip(positions, cropNode(node,[boxes[position] for position in positions])):
+            crops[position].append(crop)
+        del node
+    frames = [mergeCrops(boxCrops) for boxCrops in crops]
+    return frames, zStats
+
+#
+
+def readNodesInBox(nodes,box):
+    # readNodesInBoxes with one box every node is read for
+    frames, zStats = readNodesInBoxes(nodes,itertools.repeat([0]),[box])
+    return frames[0], zStats
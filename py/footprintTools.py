@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:48:25 2026
+
+@author: joe
+"""
+
+# building footprints as matplotlib Paths and the points of a tile that fall inside them
+# the tile's points are binned on a grid once (gridIndex) and each footprint only tests the points
+# in the grid cells its bounding box touches, instead of every footprint testing every point of the tile
+# footprints are also parsed once into flat arrays (a footprint store) cached as .npz next to the preprocessed tiles,
+# so shading jobs load a few arrays instead of parsing the tile's geojson for every sun position
+
+import os
+import json
+import numpy as np
+import matplotlib.path as mpltPath
+from scipy.spatial import ConvexHull
+from shadowTools import gridIndex, gridQuery
+from tileCache import cacheKey
+
+# bump when footprintStore changes so stores cached by the old code aren't reused
+footprintStoreVersion = 3
+
+# stores this process has loaded, keyed by path, a worker running several jobs of a tile reads its store once
+footprintStores = {}
+
+#
+
+def featureRings(feature):
+    # outer ring of every polygon of a MultiPolygon feature as an (n,2) array, holes (courtyards) are left out
+    return [np.asarray(polygon[0], dtype=float)[:,:2] for polygon in feature["geometry"]["coordinates"] if len(polygon) > 0]
+
+#
+
+def footprintPaths(feature,convexHull=True):
+    '''
+
+    Parameters:
+        feature : geojson MultiPolygon feature with state plane vertices
+        convexHull : True for one convex hull around every vertex of the feature (what removeBuildingsFromLas always did),
+            False for the footprint's own polygons, which keeps the trees in the notches of L and U shaped buildings
+
+    Returns:
+        list of matplotlib Paths, a point is in the footprint if any of them contains it
+
+    '''
+    rings = featureRings(feature)
+    if convexHull:
+        vertices = np.concatenate(rings)
+        hull = ConvexHull(vertices)
+        return [mpltPath.Path(vertices[hull.vertices])]
+    return [mpltPath.Path(ring) for ring in rings]
+
+#
+
+def footprintMembership(X,Y,features,convexHull=True,cellSize=100):
+    '''
+
+    Parameters:
+        X, Y : arrays of point coordinates in state plane feet
+        features : geojson footprint features in the same coordinates
+        convexHull : see footprintPaths
+        cellSize : grid cell size in feet used to find the points near each footprint
+
+    Returns:
+        building : int64 array, for every point the position in features of the footprint it's in, -1 for none,
+            a point inside overlapping footprints goes to the first of them
+        counts : int64 array of the points in each footprint, in the order of features
+
+    '''
+    X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    building = np.full(len(X), -1, dtype=np.int64)
+    if len(X) == 0 or len(features) == 0:
+        return building, np.zeros(len(features), dtype=np.int64)
+
+    index = gridIndex(X,Y,cellSize)
+    for i, feature in enumerate(features):
+        for path in footprintPaths(feature,convexHull):
+            (xMin, yMin), (xMax, yMax) = path.vertices.min(axis=0), path.vertices.max(axis=0)
+            candidates = gridQuery(index,xMin,xMax,yMin,yMax)
+            # points already claimed by an earlier footprint aren't tested again
+            candidates = candidates[building[candidates] < 0]
+            if len(candidates) == 0:
+                continue
+            inside = path.contains_points(np.column_stack((X[candidates], Y[candidates])))
+            building[candidates[inside]] = i
+
+    counts = np.bincount(building[building >= 0], minlength=len(features))
+    return building, counts
+
+#
+
+def footprintStore(features):
+    '''
+
+    Parameters:
+        features : geojson MultiPolygon footprint features with state plane vertices and a 'heightroof' property
+
+    Returns:
+        footprints : dict of arrays, footprint i owns vertices[offsets[i]:offsets[i+1]]
+            vertices : (V,2) x,y of every ring vertex of every footprint, in geojson order
+            offsets : len(features)+1 int64
+            ringOffsets : R+1 int64, ring r is vertices[ringOffsets[r]:ringOffsets[r+1]], rings never cross footprints
+            outerRings : R bool, False for the holes (courtyards) of a polygon
+            heights : roof height above ground in feet, 0 where heightroof isn't a float like footprintPointsFromGeoJSON
+            centroids : (B,2) mean of each footprint's vertices, like findCentroid, nan for footprints without vertices
+
+    '''
+    vertices = []
+    outerRings = []
+    counts = np.zeros(len(features), dtype=np.int64)
+    heights = np.zeros(len(features), dtype=np.float64)
+    for i, feature in enumerate(features):
+        height = feature["properties"]["heightroof"]
+        heights[i] = height if type(height) == float else 0
+        for polygonPart in feature["geometry"]["coordinates"]:
+            for r, polygonSubPart in enumerate(polygonPart):
+                ring = np.array([coordinates[:2] for coordinates in polygonSubPart], dtype=float).reshape(-1,2)
+                vertices.append(ring)
+                outerRings.append(r == 0)
+                counts[i] += len(ring)
+    ringOffsets = np.zeros(len(vertices) + 1, dtype=np.int64)
+    ringOffsets[1:] = np.cumsum([len(ring) for ring in vertices])
+    vertices = np.concatenate(vertices) if len(vertices) > 0 else np.zeros((0,2))
+    offsets = np.zeros(len(features) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(counts)
+
+    # per footprint mean of its vertices, summed by the footprint each vertex belongs to so empty footprints anywhere get nan
+    owners = np.repeat(np.arange(len(features)), counts)
+    sums = np.column_stack([np.bincount(owners, weights=vertices[:,axis], minlength=len(features)) for axis in range(2)])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        centroids = np.where(counts[:,None] > 0, sums / counts[:,None], np.nan)
+
+    footprints = {'vertices':vertices, 'offsets':offsets, 'ringOffsets':ringOffsets, 'outerRings':np.array(outerRings, dtype=bool), 'heights':heights, 'centroids':centroids}
+    return footprints
+
+#
+
+def writeFootprintStore(path,footprints):
+    # written next to the target and renamed, so a job never loads a partly written store
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    scratch = path + '.writing'
+    with open(scratch, 'wb') as f:
+        np.savez(f, **footprints)
+    os.replace(scratch, path)
+
+#
+
+def readFootprintStore(path):
+    # loaded once per process, later calls for the same path return the same arrays
+    if path not in footprintStores:
+        with np.load(path) as arrays:
+            footprintStores[path] = {name:arrays[name] for name in arrays.files}
+    return footprintStores[path]
+
+#
+
+def cachedFootprintStore(geojsonPath,cacheFolder='tileCache/'):
+    '''
+
+    Parameters:
+        geojsonPath : footprint geojson of a tile, e.g. 'buildings/buildingsTile25252.geojson'
+        cacheFolder : where stores are kept, the same folder as the preprocessed tiles by default
+
+    Returns:
+        path of the .npz store, keyed by the content of the geojson, built from it only when it doesn't exist yet,
+        pass it to jobs and load it there with readFootprintStore
+
+    '''
+    key = cacheKey([geojsonPath],{'function':'footprintStore', 'version':footprintStoreVersion})
+    path = os.path.join(cacheFolder,'footprints_{}.npz'.format(key))
+    if os.path.exists(path):
+        return path
+    with open(geojsonPath) as f:
+        features = json.load(f)["features"]
+    writeFootprintStore(path,footprintStore(features))
+    return path
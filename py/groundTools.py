@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 17:02:48 2026
+
+@author: joe
+"""
+
+# gridded ground model of a tile from its class 2 returns, built once and then looked up per point
+# instead of filtering the ground points around every building or tree
+
+import numpy as np
+from scipy import ndimage
+
+#
+
+def groundGrid(X,Y,Z,cellSize=10):
+    '''
+
+    Parameters:
+        X, Y, Z : arrays of ground (class 2) point coordinates in state plane feet
+        cellSize : grid cell size in feet
+
+    Returns:
+        grid : dict with the (ny,nx) array 'z' of median ground elevation per cell, its 'xMin', 'yMin' and 'cellSize',
+            cells without ground points (under buildings, water) take the value of the nearest cell that has some
+
+    '''
+    X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    Z = np.asarray(Z, dtype=float)
+    if len(Z) == 0:
+        raise ValueError('no ground points to build a ground grid from')
+    xMin, yMin = X.min(), Y.min()
+    nx = int(( X.max() - xMin ) // cellSize) + 1
+    ny = int(( Y.max() - yMin ) // cellSize) + 1
+    cells = ( ( Y - yMin ) // cellSize ).astype(np.int64) * nx + ( ( X - xMin ) // cellSize ).astype(np.int64)
+
+    # sort by cell then height so each cell's median is the middle of its run
+    order = np.lexsort((Z, cells))
+    cells, Z = cells[order], Z[order]
+    occupied, starts, counts = np.unique(cells, return_index=True, return_counts=True)
+    medians = ( Z[starts + ( counts - 1 ) // 2] + Z[starts + counts // 2] ) / 2
+
+    z = np.full(ny * nx, np.nan)
+    z[occupied] = medians
+    z = z.reshape(ny, nx)
+
+    holes = np.isnan(z)
+    if holes.any():
+        # index of the nearest cell with ground for every cell, one distance transform fills every hole at once
+        nearestY, nearestX = ndimage.distance_transform_edt(holes, return_distances=False, return_indices=True)
+        z = z[nearestY, nearestX]
+
+    grid = {'z':z, 'xMin':xMin, 'yMin':yMin, 'cellSize':cellSize}
+    return grid
+
+#
+
+def groundLookup(grid,X,Y):
+    # ground elevation of the cell under each point, points off the grid take the nearest edge cell
+    ny, nx = grid['z'].shape
+    ix = np.clip(( ( np.asarray(X, dtype=float) - grid['xMin'] ) // grid['cellSize'] ).astype(np.int64), 0, nx - 1)
+    iy = np.clip(( ( np.asarray(Y, dtype=float) - grid['yMin'] ) // grid['cellSize'] ).astype(np.int64), 0, ny - 1)
+    return grid['z'][iy, ix]
+
+#
+
+def groundGridFromLas(lasdf,cellSize=10):
+    # ground grid of a tile dataframe from its class 2 points
+    ground = lasdf[lasdf['class'] == 2]
+    return groundGrid(ground['X'].to_numpy(),ground['Y'].to_numpy(),ground['Z'].to_numpy(),cellSize)
+
+#
+
+def groundBilinear(grid,X,Y):
+    '''
+
+    Parameters:
+        grid : dict from groundGrid
+        X, Y : arrays of point coordinates in state plane feet
+
+    Returns:
+        ground elevation under each point, blended from the four cell centers around it so it follows slopes
+        instead of stepping at cell edges, points past the outer cell centers take the edge values
+
+    '''
+    z = grid['z']
+    ny, nx = z.shape
+    fx = np.clip(( np.asarray(X, dtype=float) - grid['xMin'] ) / grid['cellSize'] - 0.5, 0, nx - 1)
+    fy = np.clip(( np.asarray(Y, dtype=float) - grid['yMin'] ) / grid['cellSize'] - 0.5, 0, ny - 1)
+    ix = np.minimum(fx.astype(np.int64), max(nx - 2, 0))
+    iy = np.minimum(fy.astype(np.int64), max(ny - 2, 0))
+    tx = fx - ix
+    ty = fy - iy
+    ix1 = np.minimum(ix + 1, nx - 1)
+    iy1 = np.minimum(iy + 1, ny - 1)
+    return ( z[iy, ix] * ( 1 - tx ) * ( 1 - ty ) + z[iy, ix1] * tx * ( 1 - ty )
+           + z[iy1, ix] * ( 1 - tx ) * ty + z[iy1, ix1] * tx * ty )
+
+#
+
+def heightAboveGround(grid,X,Y,Z,chunkSize=1000000):
+    '''
+
+    Parameters:
+        grid : dict from groundGrid
+        X, Y, Z : arrays of point coordinates in state plane feet
+        chunkSize : points interpolated at once, bounds the temporary arrays on full tiles
+
+    Returns:
+        float64 array of each point's height above the interpolated ground in feet
+
+    '''
+    X, Y, Z = np.asarray(X), np.asarray(Y), np.asarray(Z)
+    heights = np.empty(len(Z), dtype=np.float64)
+    for start in range(0,len(Z),chunkSize):
+        stop = start + chunkSize
+        heights[start:stop] = Z[start:stop] - groundBilinear(grid,X[start:stop],Y[start:stop])
+    return heights
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 15:34:07 2026
+
+@author: joe
+"""
+
+# runs a list of named jobs on a Pool and records each one in a manifest as it finishes,
+# so a stopped or crashed run picks up where it left off, finished jobs are skipped and failed ones retried
+# the manifest is a json lines file that only ever gets lines appended, the last line for a job is its state
+
+import os
+import json
+import time
+import traceback
+from multiprocessing import Pool
+
+#
+
+def readManifest(manifestPath):
+    # last record of every job in the manifest, keyed by job name
+    records = {}
+    if not os.path.exists(manifestPath):
+        return records
+    with open(manifestPath, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # a line cut short by a crash mid-write
+                continue
+            records[record['job']] = record
+    return records
+
+#
+
+def appendManifest(manifestPath,record):
+    with open(manifestPath, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+#
+
+def finishedJobs(manifestPath):
+    # names of the jobs the manifest has as done
+    return set(key for key, record in readManifest(manifestPath).items() if record['status'] == 'done')
+
+#
+
+def runJob(task):
+    # Pool worker entry, never raises so one bad job can't stop the others, the error goes back to the parent instead
+    function, key, job = task
+    start = time.time()
+    try:
+        function(job)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return key, error, time.time() - start
+
+#
+
+def runJobs(function,jobs,manifestPath,processes=None,retries=2,chunksize=1,reportEvery=1):
+    '''
+
+    Parameters:
+        function : module level function taking one job, e.g. lasProcessBatch, its return value is ignored
+        jobs : list of [name, job] pairs, names must be unique and stable between runs, every job of the run including
+            the ones the manifest has as done, those are skipped (and their job is never read, it may be None)
+        manifestPath : json lines file recording every job that finishes or fails
+        processes : Pool size, None uses every core
+        retries : times a failed job is run again before it is left for the next run
+        chunksize : jobs handed to a worker at a time by imap_unordered, more helps with many short jobs
+        reportEvery : print progress after this many jobs finish
+
+    Returns:
+        failed : names of the jobs that still failed after every retry
+
+    '''
+    done = finishedJobs(manifestPath)
+    pending = [[key, job] for key, job in jobs if key not in done]
+    print('{} jobs, {} already done, {} to run'.format(len(jobs), len(jobs) - len(pending), len(pending)))
+
+    failed = []
+    if len(pending) == 0:
+        return failed
+    with Pool(processes) as p:
+        for attempt in range(retries + 1):
+            if len(pending) == 0:
+                break
+            if attempt > 0:
+                print('retrying {} failed jobs, attempt {} of {}'.format(len(pending), attempt, retries))
+            jobsByKey = dict(pending)
+            failed = []
+            start = time.time()
+            finished = 0
+            for key, error, seconds in p.imap_unordered(runJob, [[function, key, job] for key, job in pending], chunksize):
+                finished += 1
+                if error is None:
+                    appendManifest(manifestPath, {'job':key, 'status':'done', 'seconds':round(seconds, 3), 'finished':time.strftime('%Y-%m-%d %H:%M:%S')})
+                else:
+                    failed.append(key)
+                    appendManifest(manifestPath, {'job':key, 'status':'failed', 'attempt':attempt, 'error':error, 'finished':time.strftime('%Y-%m-%d %H:%M:%S')})
+                    print('job {} failed:\n{}'.format(key, error))
+                if finished % reportEvery == 0 or finished == len(pending):
+                    elapsed = time.time() - start
+                    remaining = elapsed / finished * ( len(pending) - finished )
+                    print('{}/{} jobs finished, {} failed, {:.0f} s elapsed, about {:.0f} s left'.format(finished, len(pending), len(failed), elapsed, remaining))
+            pending = [[key, jobsByKey[key]] for key in failed]
+
+    if len(failed) > 0:
+        print('{} jobs failed after {} retries, run again to retry them: {}'.format(len(failed), retries, failed))
+    return failed
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 12:31:09 2026
+
+@author: joe
+"""
+
+# reading las/laz tiles into dataframes, shared by the shading, deck and S3 scripts
+
+import numpy as np
+import pandas as pd
+import laspy #ensure laz handler installed: pip install "laspy[lazrs,laszip]"
+
+# column names used by every script, in the order the las dimensions are read, and their types at float64 coordinates
+LIDAR_COLUMNS = ['X', 'Y', 'Z', 'intens', 'class', 'return_number', 'number_of_returns']
+LIDAR_DTYPES = [np.float64, np.float64, np.float64, np.uint16, np.uint8, np.uint8, np.uint8]
+
+#
+
+def lasToDataFrame(las,coordinateDtype=np.float64):
+    '''
+
+    Parameters:
+        las : laspy LasData (or a chunk of points from a chunk iterator)
+        coordinateDtype : dtype of X,Y,Z, float64 keeps state plane coordinates exact,
+            float32 halves their memory but rounds to ~0.1 ft at NYC state plane magnitudes
+
+    Returns:
+        lidar_df : Pandas dataframe with one column per dimension in its native type
+            X,Y,Z scaled and offset by the header, intens uint16, class/return_number/number_of_returns uint8
+
+    '''
+    columns = {
+        # las.x/.y/.z are the integer records with the header scale and offset applied
+        'X': np.asarray(las.x, dtype=coordinateDtype),
+        'Y': np.asarray(las.y, dtype=coordinateDtype),
+        'Z': np.asarray(las.z, dtype=coordinateDtype),
+        'intens': np.ascontiguousarray(las.intensity, dtype=np.uint16),
+        'class': np.ascontiguousarray(las.classification, dtype=np.uint8),
+        'return_number': np.ascontiguousarray(las.return_number, dtype=np.uint8),
+        'number_of_returns': np.ascontiguousarray(las.number_of_returns, dtype=np.uint8),
+        }
+    lidar_df = pd.DataFrame(columns, copy=False)
+    return lidar_df
+
+#
+
+def readLas(lasFileName,coordinateDtype=np.float64):
+    '''
+
+    Parameters:
+        lasFileName : path to a .las or .laz file
+        coordinateDtype : dtype of X,Y,Z, see lasToDataFrame
+
+    Returns:
+        lidar_df : Pandas dataframe of every point in the file, see lasToDataFrame
+
+    '''
+    las = laspy.read(lasFileName)
+    lidar_df = lasToDataFrame(las,coordinateDtype)
+    return lidar_df
+
+#
+
+def chunkMask(points,header,classes=None,canopyOnly=False,bounds=None,predicate=None):
+    # boolean mask of the points in one chunk that pass every requested predicate
+    keep = np.ones(len(points), dtype=bool)
+    if classes is not None:
+        keep &= np.isin(np.asarray(points.classification), classes)
+    if canopyOnly:
+        # multiple return points that aren't the last return, the same test as lasDFcanopy
+        keep &= np.asarray(points.number_of_returns) > np.asarray(points.return_number)
+    if bounds is not None:
+        # compared on the raw integer records so no scaled coordinates are made for points that get dropped
+        xMin, xMax, yMin, yMax = bounds
+        X = np.asarray(points.X)
+        Y = np.asarray(points.Y)
+        keep &= ( X >= ( xMin - header.offsets[0] ) / header.scales[0] ) & ( X <= ( xMax - header.offsets[0] ) / header.scales[0] )
+        keep &= ( Y >= ( yMin - header.offsets[1] ) / header.scales[1] ) & ( Y <= ( yMax - header.offsets[1] ) / header.scales[1] )
+    if predicate is not None:
+        keep &= predicate(points)
+    return keep
+
+#
+
+def iterLasChunks(lasFileName,classes=None,canopyOnly=False,bounds=None,predicate=None,chunkSize=1000000,coordinateDtype=np.float64):
+    '''
+
+    Parameters:
+        lasFileName : path to a .las or .laz file
+        classes : list of classification codes to keep, e.g. [2] for ground or [3,4,5] for vegetation
+        canopyOnly : keep only points with later returns after them, see lasDFcanopy
+        bounds : [xMin,xMax,yMin,yMax] in the file's coordinate units, points outside are dropped
+        predicate : optional function taking a laspy point chunk and returning a boolean mask, for anything else
+        chunkSize : points decoded at a time
+        coordinateDtype : dtype of X,Y,Z, see lasToDataFrame
+
+    Returns:
+        generator of Pandas dataframes, one per chunk, holding only the points that passed every predicate,
+        indexed by each point's position in the file like a full read would be
+
+    '''
+    with laspy.open(lasFileName) as reader:
+        offset = 0
+        for points in reader.chunk_iterator(chunkSize):
+            keep = chunkMask(points,reader.header,classes,canopyOnly,bounds,predicate)
+            if keep.any():
+                lidar_df = lasToDataFrame(points[keep],coordinateDtype)
+                lidar_df.index = offset + np.flatnonzero(keep)
+                yield lidar_df
+            offset += len(points)
+
+#
+
+def readLasFiltered(lasFileName,classes=None,canopyOnly=False,bounds=None,predicate=None,chunkSize=1000000,coordinateDtype=np.float64):
+    '''
+
+    Streams the file in chunks and only keeps points passing the predicates (see iterLasChunks),
+    so memory follows the points kept rather than the size of the tile.
+
+    Returns:
+        lidar_df : Pandas dataframe of the kept points, indexed by their position in the file
+
+    '''
+    frames = list(iterLasChunks(lasFileName,classes,canopyOnly,bounds,predicate,chunkSize,coordinateDtype))
+    if len(frames) == 0:
+        # nothing passed, an empty frame with the usual columns and types
+        dtypes = [coordinateDtype]*3 + [np.uint16, np.uint8, np.uint8, np.uint8]
+        return pd.DataFrame({column:np.zeros(0, dtype=dtype) for column, dtype in zip(LIDAR_COLUMNS,dtypes)})
+    lidar_df = pd.concat(frames)
+    return lidar_df
+
+#
+
+def pointCloudMemory(lidar_df):
+    # bytes held by the columns and index of a point cloud dataframe
+    return int(lidar_df.memory_usage(index=True, deep=True).sum())
+
+#
+
+def printMemory(lidar_df,name):
+    megabytes = pointCloudMemory(lidar_df) / 1024**2
+    print('{}: {} points, {:.1f} MB ({:.1f} bytes per point)'.format(name, len(lidar_df), megabytes, megabytes * 1024**2 / max(len(lidar_df),1)))
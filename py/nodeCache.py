@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 19:21:56 2026
+
+@author: joe
+"""
+
+# local cache of downloaded EPT nodes with a size limit, least recently used nodes are deleted first
+# an index.json in the cache folder records every node's size, point count, bounds and last use, so nothing is
+# looked up file by file, and nodes can also be kept decoded as .npy columns (writeColumns) that are memory-mapped
+# on the next read instead of decompressing the LAZ again
+
+import os
+import json
+import time
+import shutil
+import laspy #ensure laz handler installed: pip install "laspy[lazrs,laszip]"
+from lasTools import lasToDataFrame
+from sharedPointCloud import writeColumns, readColumns
+from eptTools import fetchNodes, nodeBounds, eptHierarchy
+
+#
+
+def folderBytes(path):
+    # size of a file, or of every file in a folder
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(folder, name)) for folder, subfolders, names in os.walk(path) for name in names)
+
+#
+
+def openNodeCache(folder,maxBytes=20*2**30,decoded=True):
+    '''
+
+    Parameters:
+        folder : where nodes are kept, e.g. 'laz_NY_NewYorkCity/', .laz files already there without an index are adopted
+        maxBytes : total size of the LAZ and decoded files kept, older nodes are deleted past it
+        decoded : also keep each node decoded as .npy columns, about 4x the LAZ size, so reads skip decompression
+
+    Returns:
+        cache : dict handle with the folder, limits and index (node key to its entry), for the other functions here
+
+    '''
+    os.makedirs(folder, exist_ok=True)
+    indexPath = os.path.join(folder,'index.json')
+    if os.path.exists(indexPath):
+        with open(indexPath, encoding='utf-8') as f:
+            index = json.load(f)
+    else:
+        index = {}
+        for name in os.listdir(folder):
+            if name.endswith('.laz'):
+                path = os.path.join(folder,name)
+                index[name[:-4]] = {'bytes':os.path.getsize(path), 'decodedBytes':0, 'points':None, 'bounds':None, 'lastUsed':os.path.getmtime(path)}
+    cache = {'folder':folder, 'maxBytes':maxBytes, 'decoded':decoded, 'index':index}
+    return cache
+
+#
+
+def nodePath(cache,key):
+    return os.path.join(cache['folder'],'{}.laz'.format(key))
+
+def decodedPath(cache,key):
+    return os.path.join(cache['folder'],'decoded',key)
+
+#
+
+def saveNodeIndex(cache):
+    # written next to the index and renamed, so an interrupted run leaves the old index rather than half a new one
+    indexPath = os.path.join(cache['folder'],'index.json')
+    with open(indexPath + '.writing', 'w', encoding='utf-8') as f:
+        json.dump(cache['index'], f)
+    os.replace(indexPath + '.writing', indexPath)
+
+#
+
+def evictNodes(cache,keep=()):
+    # delete least recently used nodes until the cache fits maxBytes, nodes in keep are never deleted
+    index = cache['index']
+    total = sum(entry['bytes'] + entry['decodedBytes'] for entry in index.values())
+    for key in sorted(index, key=lambda key: index[key]['lastUsed']):
+        if total <= cache['maxBytes']:
+            break
+        if key in keep:
+            continue
+        total -= index[key]['bytes'] + index[key]['decodedBytes']
+        if os.path.exists(nodePath(cache,key)):
+            os.remove(nodePath(cache,key))
+        shutil.rmtree(decodedPath(cache,key), ignore_errors=True)
+        del index[key]
+
+#
+
+def cachedNodes(cache,source,keys,threads=16):
+    '''
+
+    Parameters:
+        cache : dict from openNodeCache
+        source : dict from eptSource the nodes come from
+        keys : node keys needed, e.g. from boxNodes
+        threads : downloads at once, see fetchNodes
+
+    Returns:
+        keys, once every node is in the cache, the ones that weren't are downloaded, adopted ones without a point count
+        or bounds get them, all of them are marked as just used, then older nodes are evicted if the cache is over its size
+
+    '''
+    index = cache['index']
+    missing = [key for key in keys if key not in index]
+    if len(missing) > 0:
+        hierarchy = eptHierarchy(source)
+        for key, path in zip(missing, fetchNodes(source,missing,cache['folder'],threads)):
+            index[key] = {'bytes':os.path.getsize(path), 'decodedBytes':0, 'points':hierarchy.get(key), 'bounds':nodeBounds(source,key), 'lastUsed':0}
+    # nodes adopted by openNodeCache without an index get their point count and bounds the first time they're used
+    adopted = [key for key in keys if index[key]['bounds'] is None]
+    if len(adopted) > 0:
+        hierarchy = eptHierarchy(source)
+        for key in adopted:
+            index[key]['points'] = hierarchy.get(key)
+            index[key]['bounds'] = nodeBounds(source,key)
+    now = time.time()
+    for key in keys:
+        index[key]['lastUsed'] = now
+    evictNodes(cache,set(keys))
+    saveNodeIndex(cache)
+    return keys
+
+#
+
+def readCachedNode(cache,key):
+    '''
+
+    Parameters:
+        cache : dict from openNodeCache
+        key : node key already fetched by cachedNodes
+
+    Returns:
+        lidar_df : Pandas dataframe of every point in the node, see lasToDataFrame, memory-mapped from the decoded
+            columns when they exist, otherwise decoded from the LAZ (and saved decoded when the cache keeps them)
+
+    '''
+    entry = cache['index'][key]
+    if entry['decodedBytes'] > 0 and os.path.isdir(decodedPath(cache,key)):
+        return readColumns(decodedPath(cache,key), mmapMode='r')
+    lidar_df = lasToDataFrame(laspy.read(nodePath(cache,key)))
+    if cache['decoded']:
+        # written to a scratch folder and renamed, a half written node is never mapped
+        scratch = decodedPath(cache,key) + '.writing'
+        shutil.rmtree(scratch, ignore_errors=True)
+        writeColumns(lidar_df,scratch)
+        shutil.rmtree(decodedPath(cache,key), ignore_errors=True)
+        os.replace(scratch, decodedPath(cache,key))
+        entry['decodedBytes'] = folderBytes(decodedPath(cache,key))
+    return lidar_df
+
+#
+
+def readCachedNodes(cache,keys):
+    # readCachedNode for each key in turn, one node in memory at a time, the index is saved with the decoded sizes after the last
+    for key in keys:
+        yield readCachedNode(cache,key)
+    evictNodes(cache,set(keys))
+    saveNodeIndex(cache)
@@ -8,34 +8,28 @@ Created on Tue Jun 28 18:03:40 2022
 
 import numpy as np
 import pandas as pd
-import boto3
-from botocore import UNSIGNED
-from botocore.client import Config
 import json
-from pyproj import Transformer
+from crsTools import convertLatLon
 import laspy #ensure laz handler installed: pip install "laspy[lazrs,laszip]"
+from lasTools import readLas
+from eptTools import eptSource, eptMetadata, boxNodes, depthForResolution, readNodesInBoxes, parseNodeKey
+from nodeCache import openNodeCache, cachedNodes, readCachedNodes
 import matplotlib.pyplot as plt
 import os
 
-#
+# downloaded nodes are kept in laz_{prefix}/ up to this many bytes, least recently used first out
+nodeCacheBytes = 20 * 2**30
+
+# also keep nodes decoded as .npy columns so repeat queries of a neighbourhood skip LAZ decompression
+decodedNodes = True
 
-def convertLatLon(lat,lon,epsgNumber):
-    transformer = Transformer.from_crs( "epsg:4326", "epsg:{}".format(epsgNumber) ) 
-    x, y = transformer.transform(lat, lon)
-    return x, y
+#
 
 def getLazFile(lazfilename):
-    with laspy.open(lazfilename) as lz:
-        las = lz.read()
-        lidarPoints = np.array((las.X,las.Y,las.Z,las.intensity,las.classification, las.return_number, las.number_of_returns)).transpose()
-        lidarDF = pd.DataFrame(lidarPoints)
-        lidarDF.columns = ['X', 'Y', 'Z', 'intens', 'class', 'return_number', 'number_of_returns']
-        lidarDF['X'] = lidarDF['X'] * lz.header.scales[0] + lz.header.offsets[0]
-        lidarDF['Y'] = lidarDF['Y'] * lz.header.scales[1] + lz.header.offsets[1]
-        lidarDF['Z'] = lidarDF['Z'] * lz.header.scales[2] + lz.header.offsets[2]
+    lidarDF = readLas(lazfilename)
     return lidarDF
 
-def stackTiles(lat,lon, boxSize=100, prefix ='NY_NewYorkCity/'):  # 'NY_FingerLakes_1_2020/' #
+def stackTiles(lat,lon, boxSize=100, prefix ='NY_NewYorkCity/', root=None, threads=16, zRange=None, resolution=None):  # 'NY_FingerLakes_1_2020/' #
     '''
     
     Parameters:
@@ -43,68 +37,74 @@ def stackTiles(lat,lon, boxSize=100, prefix ='NY_NewYorkCity/'):  # 'NY_FingerLa
         lon : longitude centerpoint in WGS 1984 (EPSG 4326)
         boxSize : crop dimensions in X & Y units of source data, typically meters
         prefix : S3 server directory name for public usgs lidar, for available servers: https://usgs.entwine.io/
+        root : local folder with a copy of the bucket's layout to read instead of S3, see eptSource
+        threads : nodes downloaded at once
+        zRange : [zmin, zmax] heights to keep in Z units of source data, in place of the outlier filter below, None keeps every height it passes
+        resolution : finest point spacing wanted in X & Y units, picks the deepest octree level read, None reads down to depth 9
         
     Returns:
         lidar_df : Pandas dataframe containing selection of point cloud retrieved from S3 bucket
         
     
     '''
+    return stackTilesBatch([lat],[lon],boxSize,prefix,root,threads,zRange,resolution)[0]
+
+#
+
+def stackTilesBatch(lats,lons, boxSizes=100, prefix ='NY_NewYorkCity/', root=None, threads=16, zRange=None, resolution=None):
+    '''
+    
+    Parameters:
+        lats, lons : arrays of centerpoints in WGS 1984 (EPSG 4326), e.g. every tree in a neighbourhood
+        boxSizes : crop dimension of every location, or one for all, in X & Y units of source data
+        prefix, root, threads, zRange, resolution : see stackTiles
+        
+    Returns:
+        list of Pandas dataframes, the stackTiles result of each location in order,
+        every node any location needs is fetched and decoded once and its points handed to each location it covers
+        
+    
+    '''
+    
+    source = eptSource(prefix,root=root)
+    epsgNumber = eptMetadata(source)['srs']['horizontal']
+    
+    # every location converted in one call
+    xs,ys = convertLatLon(np.asarray(lats, dtype=float),np.asarray(lons, dtype=float),epsgNumber)
+    xs, ys = np.atleast_1d(xs), np.atleast_1d(ys)
+    boxSizes = np.broadcast_to(np.asarray(boxSizes, dtype=float), xs.shape)
     
-    s3 = boto3.resource('s3', config=Config(signature_version=UNSIGNED))
-    bucket = s3.Bucket('usgs-lidar-public')
-    for obj in bucket.objects.filter(Prefix= prefix + 'ept.json'):
-        key = obj.key
-        body = obj.get()['Body']
-        eptJson = json.load(body)
-        epsgNumber = eptJson['srs']['horizontal']
-        span = eptJson['span']
-        [xmin,ymin,zmin,xmax,ymax,zmax] = eptJson['bounds']
-      
-    x,y = convertLatLon(lat,lon,epsgNumber)   
-    locatorx = ( x - xmin ) / ( xmax - xmin ) 
-    locatory = ( y - ymin ) / ( ymax - ymin )
+    # every node intersecting each box at every depth, keys from the hierarchy, the union downloaded together
+    zmin, zmax = zRange if zRange is not None else [-np.inf, np.inf]
+    boxes = [[x - boxSize/2, y - boxSize/2, zmin, x + boxSize/2, y + boxSize/2, zmax] for x, y, boxSize in zip(xs, ys, boxSizes)]
+    maxDepth = 9 if resolution is None else depthForResolution(source,resolution)
+    boxKeys = [boxNodes(source,box,maxDepth) for box in boxes]
+    nodeBoxes = {}
+    for position, keys in enumerate(boxKeys):
+        for key in keys:
+            nodeBoxes.setdefault(key, []).append(position)
+    keys = sorted(nodeBoxes, key=parseNodeKey)
     
-    try:
-        os.mkdir('laz_{}/'.format(prefix))
-    except:
-        pass
+    cache = openNodeCache('laz_{}/'.format(prefix),nodeCacheBytes,decodedNodes)
+    cachedNodes(cache,source,keys,threads)
     
-    # download highest level laz for entire extent
-    if os.path.exists('laz_{}/0-0-0-0.laz'.format(prefix)) == False:
-        lazfile = bucket.download_file(prefix + 'ept-data/0-0-0-0.laz','laz_{}/0-0-0-0.laz'.format(prefix))
-    else: 
-        pass
+    # each node read once and cropped for every box it's in, the outlier filter below still comes from each box's deepest whole node
+    frames, zStats = readNodesInBoxes(readCachedNodes(cache,keys),[nodeBoxes[key] for key in keys],boxes)
+    zStats = dict(zip(keys, zStats))
     
-    lidar_df = getLazFile('laz_{}/0-0-0-0.laz'.format(prefix))
-            
-    for depth in range(1,10):
-        binx = int( (locatorx * 2 ** ( depth ) ) // 1 ) 
-        biny = int( (locatory * 2 ** ( depth ) ) // 1 ) 
-        lazfile = prefix + 'ept-data/{}-{}-{}-'.format(depth,binx,biny)
-        for obj in bucket.objects.filter(Prefix = lazfile ):
-            key = obj.key
-            lazfilename = key.split('/')[2]
-            # download subsequent laz files and concat 
-            if os.path.exists('laz_{}/{}'.format(prefix,lazfilename)) == False:
-                lazfile = bucket.download_file(prefix + 'ept-data/'+lazfilename,'laz_{}/{}'.format(prefix,lazfilename))
-            else: 
-                pass
-            lidar_df2 = getLazFile('laz_{}/{}'.format(prefix,lazfilename))
-            if depth > 7:
-                low = lidar_df2['Z'].mean() - lidar_df2['Z'].std()*4
-                high = lidar_df2['Z'].mean() + lidar_df2['Z'].std()*8
-            else:
-                low = 0
-                high = 1000
-            lidar_df = pd.concat([lidar_df,lidar_df2])
-                    
-    lidar_df = lidar_df[lidar_df['Z'] > low ]
-    lidar_df = lidar_df[lidar_df['Z'] < high ]
-    lidar_df = lidar_df[lidar_df['X'] <= x + boxSize/2 ]
-    lidar_df = lidar_df[lidar_df['X'] >= x - boxSize/2 ]
-    lidar_df = lidar_df[lidar_df['Y'] <= y + boxSize/2 ]
-    lidar_df = lidar_df[lidar_df['Y'] >= y - boxSize/2 ]
-    return lidar_df
+    lidar_dfs = []
+    for lidar_df, keys in zip(frames, boxKeys):
+        low = 0
+        high = 1000
+        if len(keys) > 0 and parseNodeKey(keys[-1])[0] > 7:
+            low = zStats[keys[-1]][0] - zStats[keys[-1]][1]*4
+            high = zStats[keys[-1]][0] + zStats[keys[-1]][1]*8
+        if zRange is not None:
+            low, high = zmin, zmax
+        lidar_df = lidar_df[lidar_df['Z'] > low ]
+        lidar_df = lidar_df[lidar_df['Z'] < high ]
+        lidar_dfs.append(lidar_df)
+    return lidar_dfs
 
 ###############################################################################
 
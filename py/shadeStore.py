@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 14:52:16 2026
+
+@author: joe
+"""
+
+# shade results for every street tree in a tile in one .npz file, in place of a json per tree, timestamp and condition
+# points are grouped by tree (a sorted tree id list plus where each tree's points start, the same layout as gridIndex)
+# and hold one shading class per sun position, so a tree's results are one slice and counts are a columnar sum
+
+import numpy as np
+import pandas as pd
+import os
+from shadowTools import SHADING_CONDITIONS
+from treeCloudTools import segmentTreeRows
+from sharedPointCloud import sharePointCloud, attachPointCloud, releasePointCloud
+
+#
+
+def treeAssignment(lidar_df,trees_df):
+    '''
+
+    Parameters:
+        lidar_df : Pandas dataframe of the tile with 'X' and 'Y' columns in state plane feet
+        trees_df : Pandas dataframe of the street tree census rows in the tile, see segmentTreeRows
+
+    Returns:
+        assignment : dict of
+            treeIds : sorted tree_id of every tree with points
+            treeStarts : len(treeIds)+1 offsets, tree i owns rows[treeStarts[i]:treeStarts[i+1]]
+            rows : positions (for .iloc) of the tile's points, grouped by tree
+
+    '''
+    treeRows = sorted(segmentTreeRows(lidar_df,trees_df), key=lambda treeRow: int(treeRow[0]['tree_id']))
+    treeIds = np.array([int(tree['tree_id']) for tree, rows in treeRows], dtype=np.int64)
+    treeStarts = np.zeros(len(treeRows) + 1, dtype=np.int64)
+    treeStarts[1:] = np.cumsum([len(rows) for tree, rows in treeRows])
+    rows = np.concatenate([rows for tree, rows in treeRows]) if len(treeRows) > 0 else np.zeros(0, dtype=np.int64)
+    assignment = {'treeIds':treeIds, 'treeStarts':treeStarts, 'rows':rows}
+    return assignment
+
+#
+
+def shareTreeAssignment(assignment):
+    # rows has an entry per tree point, so like the tile it goes to the workers through a shared folder and jobs only carry a handle
+    return dict(assignment, rows=sharePointCloud(pd.DataFrame({'rows':assignment['rows']})))
+
+#
+
+def attachTreeAssignment(assignment):
+    # the assignment with its rows as an array again, for one shared by shareTreeAssignment or one that never was
+    if isinstance(assignment['rows'], np.ndarray):
+        return assignment
+    return dict(assignment, rows=attachPointCloud(assignment['rows'])['rows'].to_numpy())
+
+#
+
+def releaseTreeAssignment(assignment):
+    if not isinstance(assignment['rows'], np.ndarray):
+        releasePointCloud(assignment['rows'])
+
+#
+
+def buildShadeStore(lidar_df,classes,assignment,timestamps,lasTileNumber):
+    '''
+
+    Parameters:
+        lidar_df : Pandas dataframe of the tile the classes were computed for
+        classes : (K,N) shading classes from classifyShadingBatch, one row per sun position
+        assignment : dict from treeAssignment for the same tile
+        timestamps : K dateTimeStrings, 'YYYY_MM_DD_HHMM'
+        lasTileNumber : tile number, kept in the store
+
+    Returns:
+        store : dict of the arrays written by writeShadeStore,
+            tile, timestamps, treeIds, treeStarts, pointIndex (the lidar_df index of each tree point) and (K,points) int8 classes
+
+    '''
+    rows = assignment['rows']
+    store = {
+        'tile':np.array(str(lasTileNumber)),
+        'timestamps':np.array(timestamps, dtype=str),
+        'treeIds':assignment['treeIds'],
+        'treeStarts':assignment['treeStarts'],
+        'pointIndex':lidar_df.index.to_numpy()[rows],
+        'classes':np.ascontiguousarray(np.asarray(classes, dtype=np.int8)[:,rows]),
+        }
+    return store
+
+#
+
+def writeShadeStore(path,store):
+    # written next to the target and renamed, so readers never see a partly written tile
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    scratch = path + '.writing'
+    with open(scratch, 'wb') as f:
+        np.savez_compressed(f, **store)
+    os.replace(scratch, path)
+
+#
+
+def readShadeStore(path):
+    with np.load(path) as arrays:
+        store = {name:arrays[name] for name in arrays.files}
+    store['tile'] = str(store['tile'])
+    return store
+
+#
+
+def shadeStorePath(folder,lasTileNumber,part=None):
+    # one file per tile, or per tile and part (e.g. a date) when a tile's sun positions are split between jobs
+    if part is None:
+        return os.path.join(folder,'tile{}.npz'.format(lasTileNumber))
+    return os.path.join(folder,'tile{}_{}.npz'.format(lasTileNumber,part))
+
+#
+
+def shadeStoreParts(folder,lasTileNumber):
+    # paths of the part files of a tile written by shadeStorePath with a part, in name order
+    prefix = 'tile{}_'.format(lasTileNumber)
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.join(folder,filename) for filename in sorted(os.listdir(folder)) if filename.startswith(prefix) and filename.endswith('.npz')]
+
+#
+
+def mergeShadeStores(stores):
+    '''
+
+    Parameters:
+        stores : dicts from readShadeStore of the same tile and treeAssignment, each for some of its timestamps
+
+    Returns:
+        store : one store with every timestamp, in time order, classes stacked along the timestamp axis,
+            a timestamp in more than one store takes its classes from the last of them
+
+    '''
+    first = stores[0]
+    for store in stores[1:]:
+        if store['tile'] != first['tile'] or not ( np.array_equal(store['treeIds'], first['treeIds']) and np.array_equal(store['treeStarts'], first['treeStarts']) and np.array_equal(store['pointIndex'], first['pointIndex']) ):
+            raise ValueError('shade stores of tile {} have different trees or points, they come from different runs'.format(first['tile']))
+    rows = {}
+    for store in stores:
+        for timestamp, classes in zip(store['timestamps'], store['classes']):
+            rows[str(timestamp)] = classes
+    timestamps = sorted(rows)
+    classes = np.stack([rows[timestamp] for timestamp in timestamps]) if len(timestamps) > 0 else first['classes'][:0]
+    return dict(first, timestamps=np.array(timestamps, dtype=str), classes=classes)
+
+#
+
+def mergeShadeStoreParts(folder,lasTileNumber):
+    '''
+
+    Parameters:
+        folder : shade store folder
+        lasTileNumber : tile whose part files (one per job, e.g. per date) are all written
+
+    Returns:
+        path of the tile's single store (shadeStorePath without a part), the parts and any store already there merged
+        into it, then the parts deleted, None when the tile has no parts
+
+    '''
+    parts = shadeStoreParts(folder,lasTileNumber)
+    if len(parts) == 0:
+        return None
+    path = shadeStorePath(folder,lasTileNumber)
+    paths = ( [path] if os.path.exists(path) else [] ) + parts
+    writeShadeStore(path,mergeShadeStores([readShadeStore(storePath) for storePath in paths]))
+    for part in parts:
+        os.remove(part)
+    return path
+
+#
+
+def treeShade(store,treeId):
+    '''
+
+    Parameters:
+        store : dict from readShadeStore
+        treeId : census tree_id
+
+    Returns:
+        pointIndex : lidar index of the tree's points, empty if the tree isn't in the tile
+        classes : (K,points) shading classes of those points, one row per store timestamp
+
+    '''
+    i = np.searchsorted(store['treeIds'], treeId)
+    if i == len(store['treeIds']) or store['treeIds'][i] != treeId:
+        return store['pointIndex'][:0], store['classes'][:,:0]
+    start, stop = store['treeStarts'][i], store['treeStarts'][i+1]
+    return store['pointIndex'][start:stop], store['classes'][:,start:stop]
+
+#
+
+def shadeCounts(store):
+    '''
+
+    Parameters:
+        store : dict from readShadeStore or buildShadeStore
+
+    Returns:
+        Pandas dataframe with one row per tree and timestamp, the count of the tree's points in each shading condition
+        ('{condition}Count', see SHADING_CONDITIONS) and totalPointsCount
+
+    '''
+    treeIds, treeStarts, classes = store['treeIds'], store['treeStarts'], store['classes']
+    timestamps = store['timestamps']
+    counts = {}
+    for code, condition in enumerate(SHADING_CONDITIONS):
+        if len(treeIds) > 0:
+            # every tree owns at least one point, so reduceat sums exactly each tree's run of columns
+            counts['{}Count'.format(condition)] = np.add.reduceat(( classes == code ).astype(np.int64), treeStarts[:-1], axis=1).T.ravel()
+        else:
+            counts['{}Count'.format(condition)] = np.zeros(0, dtype=np.int64)
+    countsDF = pd.DataFrame({
+        'treeid':np.repeat(treeIds, len(timestamps)),
+        'lidarTile':store['tile'],
+        'timestamp':np.tile(timestamps, len(treeIds)),
+        **counts,
+        })
+    countsDF['totalPointsCount'] = countsDF[['{}Count'.format(condition) for condition in SHADING_CONDITIONS]].sum(axis=1)
+    return countsDF
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 09:40:05 2026
+
+@author: joe
+"""
+
+# timings for the shading and tree clipping pipelines on a synthetic tile, no las or geojson files needed
+# run from the py/ folder: python shadingBenchmarks.py
+
+import numpy as np
+import pandas as pd
+import math
+from time import perf_counter
+from pyproj import Transformer
+from crsTools import convertCoords
+from groundTools import groundGrid, groundLookup
+from footprintTools import footprintStore
+from shadowTools import projectToGround, buildingShadowPaths, classifyShading, shadowRaster, classifyShadingRaster, pointsExtent, SHADING_CONDITIONS
+
+#
+
+def syntheticTile(nPoints, tileSize=2500, seed=0):
+    # random canopy-like points over one 2500 ft state plane tile, heights above ground in feet
+    rng = np.random.default_rng(seed)
+    lasdf = pd.DataFrame({
+        'X': rng.uniform(980000, 980000 + tileSize, nPoints),
+        'Y': rng.uniform(190000, 190000 + tileSize, nPoints),
+        'Z': rng.uniform(0, 120, nPoints),
+        })
+    return lasdf
+
+#
+
+def syntheticBuildings(nBuildings, tileSize=2500, seed=0):
+    # rectangular footprints as [x,y,height] vertex lists, roof and ground vertex pairs like footprintPointsFromGeoJSON
+    rng = np.random.default_rng(seed)
+    buildings = []
+    for i in range(nBuildings):
+        x0 = rng.uniform(980000, 980000 + tileSize)
+        y0 = rng.uniform(190000, 190000 + tileSize)
+        width, depth = rng.uniform(20, 100, 2)
+        height = float(rng.uniform(20, 300))
+        buildingPoints = []
+        for x, y in [(x0,y0),(x0+width,y0),(x0+width,y0+depth),(x0,y0+depth),(x0,y0)]:
+            buildingPoints.append([x,y,height])
+            buildingPoints.append([x,y,0])
+        buildings.append(buildingPoints)
+    return buildings
+
+#
+
+def rowwiseGroundX(point,az,amp):
+    # the per-point version lasProcess used before shadowTools, kept here as the baseline
+    sinAz = math.sin( math.radians( az + 180.0 ) )
+    tanAmp = math.tan( math.radians(amp) )
+    return point[0] + ( ( point[2] / tanAmp ) * sinAz )
+
+def rowwiseGroundY(point,az,amp):
+    cosAz = math.cos( math.radians( az + 180.0 ) )
+    tanAmp = math.tan( math.radians(amp) )
+    return point[1] + ( ( point[2] / tanAmp ) * cosAz )
+
+#
+
+def benchmarkProjection(nPoints=200000, tilePoints=10000000, az=140, amp=69):
+    lasdf = syntheticTile(nPoints)
+
+    start = perf_counter()
+    rowX = lasdf.apply(lambda x: rowwiseGroundX([x['X'],x['Y'],x['Z']],az,amp) , axis=1)
+    rowY = lasdf.apply(lambda x: rowwiseGroundY([x['X'],x['Y'],x['Z']],az,amp) , axis=1)
+    rowSeconds = perf_counter() - start
+
+    start = perf_counter()
+    groundX, groundY = projectToGround(lasdf['X'].to_numpy(),lasdf['Y'].to_numpy(),lasdf['Z'].to_numpy(),az,amp)
+    vectorSeconds = perf_counter() - start
+
+    assert np.allclose(rowX.to_numpy(), groundX) and np.allclose(rowY.to_numpy(), groundY)
+
+    scale = tilePoints / nPoints
+    print('projection, {} points'.format(nPoints))
+    print('    row-wise apply: {:.3f} s ({:.1f} s per {} point tile)'.format(rowSeconds, rowSeconds * scale, tilePoints))
+    print('    vectorized:     {:.4f} s ({:.2f} s per {} point tile)'.format(vectorSeconds, vectorSeconds * scale, tilePoints))
+    print('    speedup:        {:.0f}x'.format(rowSeconds / vectorSeconds))
+
+#
+
+def benchmarkShadowIndex(nPoints=1000000, nBuildings=800, az=140, amp=69, cellSize=100):
+    lasdf = syntheticTile(nPoints)
+    buildings = syntheticBuildings(nBuildings)
+    X, Y, Z = lasdf['X'].to_numpy(), lasdf['Y'].to_numpy(), lasdf['Z'].to_numpy()
+    groundX, groundY = projectToGround(X,Y,Z,az,amp)
+    paths = buildingShadowPaths(buildings,az,amp)
+
+    start = perf_counter()
+    fullClasses = classifyShading(X,Y,groundX,groundY,paths,cellSize=None)
+    fullSeconds = perf_counter() - start
+
+    start = perf_counter()
+    indexedClasses = classifyShading(X,Y,groundX,groundY,paths,cellSize=cellSize)
+    indexedSeconds = perf_counter() - start
+
+    assert (fullClasses == indexedClasses).all()
+
+    print('shadow classification, {} points, {} buildings'.format(nPoints, nBuildings))
+    print('    every point vs every hull: {:.2f} s'.format(fullSeconds))
+    print('    {} ft grid prefilter:      {:.2f} s'.format(cellSize, indexedSeconds))
+    print('    speedup:                   {:.0f}x'.format(fullSeconds / indexedSeconds))
+
+#
+
+def shadowRasterReport(X,Y,Z,buildings,az,amp,resolutions=(2,1,0.5,0.25)):
+    # accuracy and time of the rasterized mask against the exact hull classification, one row per resolution
+    groundX, groundY = projectToGround(X,Y,Z,az,amp)
+    paths = buildingShadowPaths(buildings,az,amp)
+
+    start = perf_counter()
+    exactClasses = classifyShading(X,Y,groundX,groundY,paths)
+    exactSeconds = perf_counter() - start
+
+    rows = []
+    for resolution in resolutions:
+        start = perf_counter()
+        raster = shadowRaster(paths,pointsExtent(X,Y,groundX,groundY),resolution)
+        rasterClasses = classifyShadingRaster(X,Y,groundX,groundY,raster)
+        rasterSeconds = perf_counter() - start
+        row = {
+            'resolution':resolution,
+            'rasterCells':raster['building'].size,
+            'agreement':( rasterClasses == exactClasses ).mean(),
+            'exactSeconds':exactSeconds,
+            'rasterSeconds':rasterSeconds,
+            }
+        # share of each exact class that the raster labels the same way
+        for code, condition in enumerate(SHADING_CONDITIONS):
+            exactIn = exactClasses == code
+            row['{}Recall'.format(condition)] = ( rasterClasses[exactIn] == code ).mean() if exactIn.any() else 1.0
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+def benchmarkShadowRaster(nPoints=1000000, nBuildings=800, az=225, amp=40):
+    lasdf = syntheticTile(nPoints)
+    buildings = syntheticBuildings(nBuildings)
+    report = shadowRasterReport(lasdf['X'].to_numpy(),lasdf['Y'].to_numpy(),lasdf['Z'].to_numpy(),buildings,az,amp)
+    print('shadow raster vs exact hulls, {} points, {} buildings'.format(nPoints, nBuildings))
+    print(report.to_string(index=False, float_format='%.4f'))
+
+#
+
+def benchmarkConvertCoords(nTrees=300, pointsPerTree=3000):
+    # lat/lon for every point of every tree in a tile, the way clipTreeCloud did it (a new Transformer and two calls per tree)
+    # against the cached transformer with both axes from one call
+    lasdf = syntheticTile(nTrees * pointsPerTree)
+    X, Y = lasdf['X'].to_numpy(), lasdf['Y'].to_numpy()
+    trees = [slice(i * pointsPerTree, (i + 1) * pointsPerTree) for i in range(nTrees)]
+
+    start = perf_counter()
+    oldLat = []
+    for tree in trees:
+        lat = Transformer.from_crs("epsg:2263", "epsg:4326").transform(X[tree], Y[tree])[0]
+        lon = Transformer.from_crs("epsg:2263", "epsg:4326").transform(X[tree], Y[tree])[1]
+        oldLat.append(lat)
+    oldSeconds = perf_counter() - start
+
+    start = perf_counter()
+    newLat = []
+    for tree in trees:
+        lat, lon = convertCoords(X[tree], Y[tree])
+        newLat.append(lat)
+    newSeconds = perf_counter() - start
+
+    assert np.array_equal(np.concatenate(oldLat), np.concatenate(newLat))
+
+    print('state plane to lat/lon, {} trees of {} points'.format(nTrees, pointsPerTree))
+    print('    new transformer, two calls per tree: {:.2f} s ({:.1f} ms per tree)'.format(oldSeconds, oldSeconds * 1000 / nTrees))
+    print('    cached transformer, one call:        {:.2f} s ({:.1f} ms per tree)'.format(newSeconds, newSeconds * 1000 / nTrees))
+    print('    speedup:                             {:.1f}x'.format(oldSeconds / newSeconds))
+
+#
+
+def scanGroundElevation(groundlasdf,X,Y):
+    # the per-building window scan groundElevation used before the ground grid, kept here as the baseline
+    tilemean = groundlasdf['Z'].mean()
+    subsetdf = groundlasdf[groundlasdf['X'] <= X + 250 ]
+    subsetdf = subsetdf[subsetdf['X'] >= X - 250 ]
+    subsetdf = subsetdf[subsetdf['Y'] <= Y + 250 ]
+    subsetdf = subsetdf[subsetdf['Y'] >= Y - 250 ]
+    groundHeight = subsetdf['Z'].median()
+    if groundHeight > 0:
+        return groundHeight
+    else:
+        return tilemean
+
+def syntheticGround(nPoints, tileSize=2500, seed=0):
+    # ground returns on a surface rising 40 ft across the tile with a 10 ft swell, plus 0.3 ft of noise
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(980000, 980000 + tileSize, nPoints)
+    Y = rng.uniform(190000, 190000 + tileSize, nPoints)
+    return pd.DataFrame({'X':X, 'Y':Y, 'Z':groundSurface(X,Y) + rng.normal(0, 0.3, nPoints)})
+
+def groundSurface(X,Y):
+    return 20 + 40 * ( X - 980000 ) / 2500 + 10 * np.sin(( Y - 190000 ) / 400)
+
+def benchmarkGroundGrid(nGround=2000000, nBuildings=800, cellSize=10):
+    groundlasdf = syntheticGround(nGround)
+    rng = np.random.default_rng(1)
+    centroidX = rng.uniform(980000, 982500, nBuildings)
+    centroidY = rng.uniform(190000, 192500, nBuildings)
+
+    start = perf_counter()
+    scanned = np.array([scanGroundElevation(groundlasdf,x,y) for x, y in zip(centroidX, centroidY)])
+    scanSeconds = perf_counter() - start
+
+    start = perf_counter()
+    grid = groundGrid(groundlasdf['X'].to_numpy(),groundlasdf['Y'].to_numpy(),groundlasdf['Z'].to_numpy(),cellSize)
+    gridSeconds = perf_counter() - start
+    start = perf_counter()
+    looked = groundLookup(grid,centroidX,centroidY)
+    lookupSeconds = perf_counter() - start
+
+    truth = groundSurface(centroidX,centroidY)
+    print('ground elevation under {} buildings, {} ground points'.format(nBuildings, nGround))
+    print('    500 ft window median per building: {:.2f} s, mean error {:.2f} ft'.format(scanSeconds, np.abs(scanned - truth).mean()))
+    print('    {} ft ground grid:                  {:.2f} s to build, {:.5f} s to look up, mean error {:.2f} ft'.format(cellSize, gridSeconds, lookupSeconds, np.abs(looked - truth).mean()))
+    print('    speedup:                            {:.0f}x'.format(scanSeconds / ( gridSeconds + lookupSeconds )))
+
+#
+
+def syntheticFootprints(nBuildings, tileSize=2500, seed=0):
+    # L shaped geojson footprint features, the shape a convex hull shades the most wrongly
+    rng = np.random.default_rng(seed)
+    features = []
+    for i in range(nBuildings):
+        x0 = rng.uniform(980000, 980000 + tileSize)
+        y0 = rng.uniform(190000, 190000 + tileSize)
+        width, depth = rng.uniform(20, 100, 2)
+        ring = [[x0,y0],[x0+width,y0],[x0+width,y0+depth/2],[x0+width/2,y0+depth/2],[x0+width/2,y0+depth],[x0,y0+depth],[x0,y0]]
+        features.append({'geometry':{'coordinates':[[ring]]}, 'properties':{'heightroof':float(rng.uniform(20, 300))}})
+    return features
+
+def benchmarkShadowSweep(nPoints=1000000, nBuildings=800, az=225, amp=40, nSuns=9):
+    lasdf = syntheticTile(nPoints)
+    features = syntheticFootprints(nBuildings)
+    footprints = footprintStore(features)
+    # the vertex lists the hull is built from, roof and ground vertex pairs like footprintPointsFromGeoJSON
+    buildings = [[[x,y,h] for x, y in feature['geometry']['coordinates'][0][0] for h in (feature['properties']['heightroof'],0)] for feature in features]
+    X, Y, Z = lasdf['X'].to_numpy(), lasdf['Y'].to_numpy(), lasdf['Z'].to_numpy()
+    groundX, groundY = projectToGround(X,Y,Z,az,amp)
+
+    start = perf_counter()
+    for k in range(nSuns):
+        hullPaths = buildingShadowPaths(buildings,az+k,amp)
+    hullSeconds = ( perf_counter() - start ) / nSuns
+    start = perf_counter()
+    for k in range(nSuns):
+        sweepPaths = buildingShadowPaths(footprints,az+k,amp)
+    sweepSeconds = ( perf_counter() - start ) / nSuns
+
+    start = perf_counter()
+    hullClasses = classifyShading(X,Y,groundX,groundY,hullPaths)
+    hullClassifySeconds = perf_counter() - start
+    start = perf_counter()
+    sweepClasses = classifyShading(X,Y,groundX,groundY,sweepPaths)
+    sweepClassifySeconds = perf_counter() - start
+
+    print('building shadows for one sun position, {} L shaped buildings, {} points'.format(nBuildings, nPoints))
+    print('    convex hull of projected vertices: {:.3f} s to build, {:.2f} s to classify, {} points in shade'.format(hullSeconds, hullClassifySeconds, int(( hullClasses == 1 ).sum())))
+    print('    footprint swept along the sun:     {:.3f} s to build, {:.2f} s to classify, {} points in shade'.format(sweepSeconds, sweepClassifySeconds, int(( sweepClasses == 1 ).sum())))
+    print('    points the hull shades wrongly:    {}'.format(int(( hullClasses != sweepClasses ).sum())))
+
+#
+
+if __name__ == '__main__':
+    benchmarkProjection()
+    benchmarkShadowIndex()
+    benchmarkShadowRaster()
+    benchmarkConvertCoords()
+    benchmarkGroundGrid()
+    benchmarkShadowSweep()
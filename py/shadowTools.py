@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 09:12:41 2026
+
+@author: joe
+"""
+
+# vectorized shadow geometry shared by the shading scripts
+# everything here works on whole numpy arrays at once, no per-point python loops
+
+import numpy as np
+import matplotlib.path as mpltPath
+from scipy.spatial import ConvexHull
+
+# shading classes, the codes index into SHADING_CONDITIONS which match the output file suffixes
+SHADING_GROUND = 0
+IN_SHADE = 1
+SHADING_FACADE = 2
+SHADING_CONDITIONS = ['shadingGround','inShade','shadingFacade']
+
+#
+
+def sunOffsets(az,amp):
+    '''
+
+    Parameters:
+        az : sun azimuth in geometric degrees (counterclockwise, north = 90), scalar or array
+        amp : sun altitude in degrees, scalar or array
+
+    Returns:
+        dx, dy : ground offset of a point's shadow per unit of height
+
+    '''
+    azRadians = np.radians( np.asarray(az, dtype=float) + 180.0 )
+    tanAmp = np.tan( np.radians( np.asarray(amp, dtype=float) ) )
+    dx = np.sin(azRadians) / tanAmp
+    dy = np.cos(azRadians) / tanAmp
+    return dx, dy
+
+#
+
+def projectToGround(X,Y,Z,az,amp):
+    '''
+
+    Parameters:
+        X, Y, Z : arrays of point coordinates, Z as height above ground
+        az : sun azimuth in geometric degrees (counterclockwise, north = 90)
+        amp : sun altitude in degrees
+
+    Returns:
+        groundX, groundY : arrays of where each point's shadow lands on the ground plane
+
+    '''
+    dx, dy = sunOffsets(az,amp)
+    X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    Z = np.asarray(Z, dtype=float)
+    groundX = X + Z * dx
+    groundY = Y + Z * dy
+    return groundX, groundY
+
+#
+
+def pointsForHull(points,az,amp):
+    '''
+
+    Parameters:
+        points : list or (N,3) array of [x,y,height] vertices, e.g. from footprintPointsFromGeoJSON
+        az : sun azimuth in geometric degrees (counterclockwise, north = 90)
+        amp : sun altitude in degrees
+
+    Returns:
+        (N,2) array of the vertices projected to the ground, ready for convexHull2D
+
+    '''
+    points = np.asarray(points, dtype=float).reshape(-1,3)
+    groundX, groundY = projectToGround(points[:,0],points[:,1],points[:,2],az,amp)
+    return np.column_stack((groundX,groundY))
+
+#
+
+def projectToGroundBatch(X,Y,Z,az,amp):
+    '''
+
+    Parameters:
+        X, Y, Z : arrays of N point coordinates, Z as height above ground
+        az, amp : arrays of K sun azimuths and altitudes in degrees
+
+    Returns:
+        groundX, groundY : (K,N) arrays, one row of shadow positions per sun position
+
+    '''
+    dx, dy = sunOffsets(az,amp)
+    dx = np.atleast_1d(dx)[:,None]
+    dy = np.atleast_1d(dy)[:,None]
+    X = np.asarray(X, dtype=float)[None,:]
+    Y = np.asarray(Y, dtype=float)[None,:]
+    Z = np.asarray(Z, dtype=float)[None,:]
+    groundX = X + Z * dx
+    groundY = Y + Z * dy
+    return groundX, groundY
+
+#
+
+def shadowPath(groundPoints):
+    # matplotlib path around the convex hull of a building's projected vertices
+    groundPoints = np.asarray(groundPoints, dtype=float)
+    hull = ConvexHull(groundPoints)
+    return mpltPath.Path(hull.points[hull.vertices])
+
+#
+
+def footprintShadowPaths(footprints,az,amp):
+    # every footprint vertex lifted to its roof height and projected in one call, then one hull of the
+    # footprint and its projected roof per building, the same hulls buildingShadowPaths makes from vertex lists
+    vertices, offsets = footprints['vertices'], footprints['offsets']
+    heights = np.repeat(footprints['heights'], np.diff(offsets))
+    groundX, groundY = projectToGround(vertices[:,0],vertices[:,1],heights,az,amp)
+    roofs = np.column_stack((groundX,groundY))
+    paths = []
+    for start, stop in zip(offsets[:-1], offsets[1:]):
+        paths.append(shadowPath(np.concatenate((vertices[start:stop], roofs[start:stop]))))
+    return paths
+
+#
+
+def footprintSweepPaths(footprints,az,amp):
+    '''
+
+    Parameters:
+        footprints : footprint store, see footprintStore
+        az : sun azimuth in geometric degrees (counterclockwise, north = 90)
+        amp : sun altitude in degrees
+
+    Returns:
+        one matplotlib Path per footprint with vertices, the exact ground shadow of the building as a prism:
+        every outer ring swept along the sun vector to where its roof's shadow lands (the Minkowski sum of the ring
+        and that segment) as the ring plus the band each run of edges facing along the sun vector sweeps, all counterclockwise
+        so Path.contains_points (nonzero winding) tests their union, the notches of L and U shaped buildings
+        stay lit where the convex hull filled them in, holes (courtyards) are treated as roofed like the hull did
+
+    '''
+    vertices, offsets, ringOffsets = footprints['vertices'], footprints['offsets'], footprints['ringOffsets']
+    ringLengths = np.diff(ringOffsets)
+    ringOf = np.repeat(np.arange(len(ringLengths)), ringLengths)
+    position = np.arange(len(vertices)) - ringOffsets[ringOf]
+    following = np.where(position == ringLengths[ringOf] - 1, ringOffsets[ringOf], np.arange(len(vertices)) + 1)
+
+    # clockwise rings are read backwards so every ring winds counterclockwise
+    area = np.bincount(ringOf, vertices[:,0] * vertices[following,1] - vertices[following,0] * vertices[:,1], minlength=len(ringLengths))
+    reverse = area[ringOf] < 0
+    ring = vertices[np.where(reverse, ringOffsets[ringOf] + ringLengths[ringOf] - 1 - position, np.arange(len(vertices)))]
+
+    keep = ( footprints['outerRings'] & ( ringLengths >= 3 ) )[ringOf]
+    ring, following, position = ring[keep], following[keep], position[keep]
+    footprintOf = np.searchsorted(offsets, np.flatnonzero(keep), side='right') - 1
+    following = np.searchsorted(np.flatnonzero(keep), following)
+
+    # shadow of each vertex's roof corner offset, the whole tile in one projection
+    dx, dy = sunOffsets(az,amp)
+    shift = footprints['heights'][footprintOf][:,None] * np.array([dx,dy])
+
+    # only edges whose outside faces along the shift sweep ground outside the footprint, on a counterclockwise ring
+    # that's cross(b - a, shift) < 0, the roof's own outline is covered by the footprint and those sweeps
+    b = ring[following]
+    front = ( ( b[:,0] - ring[:,0] ) * shift[:,1] - ( b[:,1] - ring[:,1] ) * shift[:,0] ) < 0
+    edges = np.flatnonzero(front)
+    # each run of consecutive front edges sweeps a band, the chain shifted then the chain walked back (counterclockwise)
+    runStarts = np.flatnonzero(~np.concatenate(([False], front[:-1] & ( position[1:] > 0 )))[edges])
+    runOf = np.repeat(np.arange(len(runStarts)), np.diff(np.append(runStarts, len(edges))))
+    inRun = np.arange(len(edges)) - runStarts[runOf]
+    runLengths = np.bincount(runOf, minlength=len(runStarts))
+    lastEdges = edges[runStarts + runLengths - 1]
+    firstEdges = edges[runStarts]
+    runs = np.arange(len(runStarts))
+    bandVertices = np.concatenate((ring[edges] + shift[edges], b[lastEdges] + shift[lastEdges], b[lastEdges], ring[edges], ring[firstEdges] + shift[firstEdges]))
+    bandRuns = np.concatenate((runOf, runs, runs, runOf, runs))
+    bandParts = np.concatenate((np.zeros(len(edges)), np.zeros(len(runs)), np.ones(len(runs)), np.ones(len(edges)), np.full(len(runs), 2)))
+    bandSteps = np.concatenate((inRun, runLengths, np.zeros(len(runs)), runLengths[runOf] - inRun, np.zeros(len(runs))))
+    order = np.lexsort((bandSteps, bandParts, bandRuns))
+    bandVertices, bandParts, bandSteps, bandRuns = bandVertices[order], bandParts[order], bandSteps[order], bandRuns[order]
+    bandCodes = np.where(bandParts == 2, mpltPath.Path.CLOSEPOLY, np.where(( bandParts == 0 ) & ( bandSteps == 0 ), mpltPath.Path.MOVETO, mpltPath.Path.LINETO))
+    ringCodes = np.where(position == 0, mpltPath.Path.MOVETO, mpltPath.Path.LINETO)
+
+    # rings then bands, a stable sort by footprint keeps each footprint's pieces together and whole
+    pieceVertices = np.concatenate((ring, bandVertices))
+    pieceCodes = np.concatenate((ringCodes, bandCodes)).astype(mpltPath.Path.code_type)
+    pieceFootprints = np.concatenate((footprintOf, footprintOf[firstEdges][bandRuns]))
+    order = np.argsort(pieceFootprints, kind='stable')
+    pieceVertices, pieceCodes = pieceVertices[order], pieceCodes[order]
+    starts = np.searchsorted(pieceFootprints[order], np.arange(len(offsets)))
+
+    paths = []
+    for start, stop in zip(starts[:-1], starts[1:]):
+        if stop > start:
+            paths.append(mpltPath.Path(pieceVertices[start:stop], pieceCodes[start:stop]))
+    return paths
+
+#
+
+def buildingShadowPaths(buildings,az,amp):
+    # buildings is a list of [x,y,height] vertex lists, one per footprint, shaded by the hull of the projected vertices,
+    # or a footprint store (see footprintStore), shaded exactly by footprintSweepPaths
+    if isinstance(buildings, dict):
+        return footprintSweepPaths(buildings,az,amp)
+    paths = []
+    for buildingPoints in buildings:
+        paths.append(shadowPath(pointsForHull(buildingPoints,az,amp)))
+    return paths
+
+#
+
+def gridIndex(X,Y,cellSize=100):
+    '''
+
+    Parameters:
+        X, Y : arrays of point coordinates
+        cellSize : grid cell edge length in the units of X and Y
+
+    Returns:
+        index : dict describing a grid binning of the points, for gridQuery
+            points are sorted by cell so each cell's points are one contiguous run of 'order'
+
+    '''
+    X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    if len(X) == 0:
+        xMin, yMin, nx, ny = 0.0, 0.0, 1, 1
+    else:
+        xMin, yMin = X.min(), Y.min()
+        nx = int( ( X.max() - xMin ) // cellSize ) + 1
+        ny = int( ( Y.max() - yMin ) // cellSize ) + 1
+    cellX = ( ( X - xMin ) // cellSize ).astype(np.int64)
+    cellY = ( ( Y - yMin ) // cellSize ).astype(np.int64)
+    cells = cellY * nx + cellX
+    order = np.argsort(cells, kind='stable')
+    starts = np.searchsorted(cells[order], np.arange(nx * ny + 1))
+    index = {'order':order, 'starts':starts, 'xMin':xMin, 'yMin':yMin, 'nx':nx, 'ny':ny, 'cellSize':cellSize}
+    return index
+
+#
+
+def gridQuery(index,xMin,xMax,yMin,yMax):
+    # indices of the points in every grid cell touched by the box, a superset of the points inside it
+    cellSize = index['cellSize']
+    ix0 = max( int( ( xMin - index['xMin'] ) // cellSize ), 0 )
+    ix1 = min( int( ( xMax - index['xMin'] ) // cellSize ), index['nx'] - 1 )
+    iy0 = max( int( ( yMin - index['yMin'] ) // cellSize ), 0 )
+    iy1 = min( int( ( yMax - index['yMin'] ) // cellSize ), index['ny'] - 1 )
+    if ix0 > ix1 or iy0 > iy1:
+        return np.zeros(0, dtype=np.int64)
+    runs = []
+    # cells in one grid row are contiguous in the sort order, so each row is a single slice
+    for iy in range(iy0,iy1+1):
+        first = index['starts'][iy * index['nx'] + ix0]
+        last = index['starts'][iy * index['nx'] + ix1 + 1]
+        if last > first:
+            runs.append(index['order'][first:last])
+    if len(runs) == 0:
+        return np.zeros(0, dtype=np.int64)
+    return np.concatenate(runs)
+
+#
+
+def classifyShading(X,Y,groundX,groundY,paths,cellSize=100):
+    '''
+
+    Parameters:
+        X, Y : arrays of point coordinates
+        groundX, groundY : the same points projected to the ground for one sun position
+        paths : building shadow paths for that sun position, from buildingShadowPaths
+        cellSize : grid cell size used to prefilter points against each shadow's bounding box,
+            None tests every point against every shadow
+
+    Returns:
+        int8 array of shading classes, indexes into SHADING_CONDITIONS:
+            0 shadingGround : the point casts its shadow on open ground
+            1 inShade : the point sits inside a building's shadow
+            2 shadingFacade : the point is lit but casts its shadow onto a building
+
+    '''
+    pointsXY = np.column_stack((X,Y))
+    pointsGround = np.column_stack((groundX,groundY))
+    inShade = np.zeros(len(pointsXY), dtype=bool)
+    inFacade = np.zeros(len(pointsXY), dtype=bool)
+    if cellSize is not None:
+        index = gridIndex(groundX,groundY,cellSize)
+    for path in paths:
+        # both tests need the point's shadow inside the hull, so only those points go further
+        if cellSize is None:
+            candidates = np.arange(len(pointsGround))
+        else:
+            xMin, yMin = path.vertices.min(axis=0)
+            xMax, yMax = path.vertices.max(axis=0)
+            candidates = gridQuery(index,xMin,xMax,yMin,yMax)
+            if len(candidates) == 0:
+                continue
+        hits = candidates[path.contains_points(pointsGround[candidates])]
+        inFacade[hits] = True
+        # the XY test only matters for points that aren't already in shade
+        hits = hits[~inShade[hits]]
+        if len(hits) > 0:
+            inShade[hits] = path.contains_points(pointsXY[hits])
+    classes = np.zeros(len(pointsXY), dtype=np.int8)
+    classes[inFacade] = SHADING_FACADE
+    classes[inShade] = IN_SHADE
+    return classes
+
+#
+
+def shadowRaster(paths,extent,resolution=0.5):
+    '''
+
+    Parameters:
+        paths : building shadow paths for one sun position, from buildingShadowPaths, filled like Path.contains_points
+        extent : [xMin,xMax,yMin,yMax] area that needs covering, usually the points and their shadows
+        resolution : raster cell size in the units of the coordinates, e.g. 0.5 ft
+
+    Returns:
+        raster : dict with an int32 'building' array (rows are y, columns are x) holding, for each cell centre, the position
+            in paths of the one shadow covering it, -1 where none does and -2 where several do, plus the paths themselves
+            and the origin and resolution needed by rasterBuilding
+
+    '''
+    xMin, xMax, yMin, yMax = extent
+    if len(paths) > 0:
+        # nothing outside the shadows' own bounding box can be shaded, so the grid doesn't need to go further
+        allVertices = np.concatenate([path.vertices for path in paths])
+        xMin, yMin = np.maximum([xMin,yMin], allVertices.min(axis=0))
+        xMax, yMax = np.minimum([xMax,yMax], allVertices.max(axis=0))
+    nx = max( int( np.ceil( ( xMax - xMin ) / resolution ) ) + 1, 1 )
+    ny = max( int( np.ceil( ( yMax - yMin ) / resolution ) ) + 1, 1 )
+
+    # each shadow covers runs of cells per row, marked as +1 at their start and -1 after their end
+    # so a single cumulative sum along the rows fills every shadow at once, the same marks with the shadow's
+    # position + 1 instead of 1 sum to that position + 1 in the cells it covers alone
+    coverage = np.zeros((ny,nx+1), dtype=np.int16)
+    owners = np.zeros((ny,nx+1), dtype=np.int32)
+    for i, path in enumerate(paths):
+        # every edge of every piece of the path, pieces are closed back to their first vertex
+        polygons = path.to_polygons(closed_only=False)
+        startX = np.concatenate([polygon[:,0] for polygon in polygons])
+        startY = np.concatenate([polygon[:,1] for polygon in polygons])
+        endX = np.concatenate([np.roll(polygon[:,0],-1) for polygon in polygons])
+        endY = np.concatenate([np.roll(polygon[:,1],-1) for polygon in polygons])
+        firstRow = max( int( np.ceil( ( startY.min() - yMin ) / resolution - 0.5 ) ), 0 )
+        lastRow = min( int( np.floor( ( startY.max() - yMin ) / resolution - 0.5 ) ), ny - 1 )
+        if firstRow > lastRow:
+            continue
+        rows = np.arange(firstRow,lastRow+1)
+        rowY = yMin + ( rows[:,None] + 0.5 ) * resolution
+        # half open crossings, +1 for edges going up and -1 going down, so the running sum along a row is the winding number
+        up = ( startY <= rowY ) & ( endY > rowY )
+        down = ( endY <= rowY ) & ( startY > rowY )
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossX = startX + ( rowY - startY ) / ( endY - startY ) * ( endX - startX )
+        crossX = np.where(up | down, crossX, np.inf)
+        order = np.argsort(crossX, axis=1)
+        crossX = np.take_along_axis(crossX, order, axis=1)
+        winding = np.cumsum(np.take_along_axis(up.astype(np.int16) - down.astype(np.int16), order, axis=1), axis=1)
+        # inside between consecutive crossings wherever the winding number isn't 0 (the Path.contains_points rule)
+        runRows, runs = np.nonzero(( winding[:,:-1] != 0 ) & np.isfinite(crossX[:,1:]))
+        if len(runs) == 0:
+            continue
+        firstCol = np.maximum(np.ceil( ( crossX[runRows,runs] - xMin ) / resolution - 0.5 ), 0)
+        lastCol = np.minimum(np.floor( ( crossX[runRows,runs+1] - xMin ) / resolution - 0.5 ), nx - 1)
+        keep = firstCol <= lastCol
+        runRows, firstCol, lastCol = rows[runRows[keep]], firstCol[keep].astype(np.int64), lastCol[keep].astype(np.int64)
+        np.add.at(coverage, (runRows,firstCol), 1)
+        np.add.at(coverage, (runRows,lastCol+1), -1)
+        np.add.at(owners, (runRows,firstCol), i + 1)
+        np.add.at(owners, (runRows,lastCol+1), -( i + 1 ))
+    coverage = np.cumsum(coverage, axis=1, dtype=np.int16)[:,:nx]
+    building = np.cumsum(owners, axis=1, dtype=np.int32)[:,:nx] - 1
+    building[coverage == 0] = -1
+    building[coverage > 1] = -2
+    raster = {'building':building, 'paths':paths, 'xMin':xMin, 'yMin':yMin, 'resolution':resolution}
+    return raster
+
+#
+
+def rasterBuilding(raster,X,Y):
+    # the raster's 'building' value at each point's cell, points off the raster are under no shadow (-1)
+    building = raster['building']
+    cols = np.floor( ( np.asarray(X, dtype=float) - raster['xMin'] ) / raster['resolution'] )
+    rows = np.floor( ( np.asarray(Y, dtype=float) - raster['yMin'] ) / raster['resolution'] )
+    inside = ( cols >= 0 ) & ( cols < building.shape[1] ) & ( rows >= 0 ) & ( rows < building.shape[0] )
+    values = np.full(len(cols), -1, dtype=np.int32)
+    values[inside] = building[rows[inside].astype(np.int64),cols[inside].astype(np.int64)]
+    return values
+
+#
+
+def classifyShadingRaster(X,Y,groundX,groundY,raster):
+    '''
+
+    Same classes as classifyShading but from a shadowRaster lookup, so the cost per point doesn't
+    depend on the number of buildings. Like classifyShading a point is inShade only when it and its
+    shadow are under the same building's shadow. Points where either cell is covered by several
+    shadows are classified exactly against the raster's paths, everything else is only as sharp
+    as the raster resolution.
+
+    '''
+    X, Y = np.asarray(X, dtype=float), np.asarray(Y, dtype=float)
+    groundX, groundY = np.asarray(groundX, dtype=float), np.asarray(groundY, dtype=float)
+    groundBuilding = rasterBuilding(raster,groundX,groundY)
+    pointBuilding = rasterBuilding(raster,X,Y)
+    classes = np.zeros(len(groundBuilding), dtype=np.int8)
+    classes[groundBuilding != -1] = SHADING_FACADE
+    classes[( groundBuilding >= 0 ) & ( pointBuilding == groundBuilding )] = IN_SHADE
+    # the raster can't say which shadows overlap there, a point over several only needs the ones whose bounding box holds it
+    several = np.flatnonzero(( groundBuilding == -2 ) | ( ( groundBuilding >= 0 ) & ( pointBuilding == -2 ) ))
+    if len(several) > 0:
+        classes[several] = classifyShading(X[several],Y[several],groundX[several],groundY[several],raster['paths'])
+    return classes
+
+#
+
+def pointsExtent(X,Y,groundX,groundY):
+    # [xMin,xMax,yMin,yMax] covering both the points and where their shadows land
+    xMin = min(np.min(X), np.min(groundX))
+    xMax = max(np.max(X), np.max(groundX))
+    yMin = min(np.min(Y), np.min(groundY))
+    yMax = max(np.max(Y), np.max(groundY))
+    return [xMin,xMax,yMin,yMax]
+
+#
+
+def classifyShadingBatch(X,Y,Z,buildings,az,amp,chunkSize=100000,cellSize=100,resolution=None):
+    '''
+
+    Parameters:
+        X, Y, Z : arrays of N point coordinates, Z as height above ground
+        buildings : list of [x,y,height] vertex lists, one per footprint, or a footprint store (see footprintStore)
+        az, amp : arrays of K sun azimuths and altitudes in degrees
+        chunkSize : points projected at once, memory use is about K * chunkSize * 16 bytes
+        cellSize : grid cell size for the shadow bounding box prefilter, see classifyShading
+        resolution : if given, classify with a shadowRaster of this cell size per sun position instead of the exact hulls
+
+    Returns:
+        (K,N) int8 array of shading classes, one row per sun position, see classifyShading
+
+    '''
+    az = np.atleast_1d(np.asarray(az, dtype=float))
+    amp = np.atleast_1d(np.asarray(amp, dtype=float))
+    X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    Z = np.asarray(Z, dtype=float)
+
+    # building shadows only depend on the sun, so they are built once per sun position up front
+    pathsPerSun = [buildingShadowPaths(buildings,az[k],amp[k]) for k in range(len(az))]
+
+    if resolution is not None:
+        rasters = []
+        for k in range(len(az)):
+            groundX, groundY = projectToGround(X,Y,Z,az[k],amp[k])
+            rasters.append(shadowRaster(pathsPerSun[k],pointsExtent(X,Y,groundX,groundY),resolution))
+
+    classes = np.zeros((len(az),len(X)), dtype=np.int8)
+    for start in range(0,len(X),chunkSize):
+        stop = start + chunkSize
+        groundX, groundY = projectToGroundBatch(X[start:stop],Y[start:stop],Z[start:stop],az,amp)
+        for k in range(len(az)):
+            if resolution is None:
+                classes[k,start:stop] = classifyShading(X[start:stop],Y[start:stop],groundX[k],groundY[k],pathsPerSun[k],cellSize)
+            else:
+                classes[k,start:stop] = classifyShadingRaster(X[start:stop],Y[start:stop],groundX[k],groundY[k],rasters[k])
+    return classes
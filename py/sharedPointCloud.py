@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:48:30 2026
+
+@author: joe
+"""
+
+# one copy of a preprocessed point cloud for every Pool worker
+# the parent writes each column once as a .npy file (in /dev/shm when there is one, so it stays in RAM)
+# and hands the workers a small picklable handle, workers memory-map the columns instead of receiving a pickled dataframe
+# works the same with the fork and spawn start methods
+
+import numpy as np
+import pandas as pd
+import os
+import json
+import shutil
+import tempfile
+
+# point clouds this process has already attached to, keyed by folder, so each worker maps a tile once
+attachedPointClouds = {}
+
+#
+
+def writeColumns(lidar_df,path):
+    # one .npy file per column plus the index, the layout shared folders and the tile cache both use
+    os.makedirs(path, exist_ok=True)
+    columns = [str(column) for column in lidar_df.columns]
+    for column, name in zip(lidar_df.columns, columns):
+        np.save(os.path.join(path,'{}.npy'.format(name)), np.ascontiguousarray(lidar_df[column].to_numpy()))
+    np.save(os.path.join(path,'_index.npy'), np.ascontiguousarray(lidar_df.index.to_numpy()))
+    with open(os.path.join(path,'columns.json'), 'w', encoding='utf-8') as f:
+        json.dump(columns, f)
+    return columns
+
+#
+
+def readColumns(path,mmapMode='r'):
+    # dataframe over a folder written by writeColumns, mmapMode='r' maps the files without copying, None reads them into memory
+    with open(os.path.join(path,'columns.json')) as f:
+        columns = json.load(f)
+    data = {}
+    for column in columns:
+        data[column] = np.load(os.path.join(path,'{}.npy'.format(column)), mmap_mode=mmapMode)
+    index = np.load(os.path.join(path,'_index.npy'), mmap_mode=mmapMode)
+    lidar_df = pd.DataFrame(data, index=pd.Index(index), copy=False)
+    return lidar_df
+
+#
+
+def sharePointCloud(lidar_df,directory=None):
+    '''
+
+    Parameters:
+        lidar_df : Pandas dataframe of a point cloud, numeric columns only
+        directory : where the shared folder is made, defaults to /dev/shm if available, otherwise the temp folder
+
+    Returns:
+        handle : dict with the folder and column names, cheap to pickle into every Pool job
+
+    '''
+    if directory is None:
+        directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    path = tempfile.mkdtemp(prefix='pointCloud_', dir=directory)
+    columns = writeColumns(lidar_df,path)
+    handle = {'path':path, 'columns':columns}
+    return handle
+
+#
+
+def attachPointCloud(handle):
+    '''
+
+    Parameters:
+        handle : dict returned by sharePointCloud, a dataframe is passed straight back so callers can run without sharing
+
+    Returns:
+        lidar_df : read-only Pandas dataframe backed by the shared memory-mapped columns, no copy is made
+
+    '''
+    if isinstance(handle, pd.DataFrame):
+        return handle
+    path = handle['path']
+    if path not in attachedPointClouds:
+        attachedPointClouds[path] = readColumns(path)
+    return attachedPointClouds[path]
+
+#
+
+def releasePointCloud(handle):
+    # called by the parent once every worker is done with the point cloud
+    attachedPointClouds.pop(handle['path'], None)
+    shutil.rmtree(handle['path'], ignore_errors=True)
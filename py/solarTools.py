@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:21:39 2026
+
+@author: joe
+"""
+
+# sun azimuth, altitude and clear sky direct radiation for whole arrays of times at once
+# positions follow the NOAA solar calculator equations (https://gml.noaa.gov/grad/solcalc/calcdetails.html),
+# the same source the hand copied sun positions came from, radiation follows pysolar's get_radiation_direct (Masters, p. 412)
+
+import numpy as np
+import pandas as pd
+
+# NYC street tree census extent, the default location for the shading scripts
+NYC_LATITUDE = 40.7128
+NYC_LONGITUDE = -74.0060
+
+# results already computed by this process, keyed by (lat cell, lon cell) with a dataframe indexed by UTC nanoseconds
+solarCache = {}
+
+#
+
+def utcTimes(times,timezone='America/New_York'):
+    # nanosecond DatetimeIndex in UTC, times without a timezone are read as local clock time in timezone,
+    # the hour skipped by daylight saving moves forward and the repeated hour is taken as standard time
+    times = pd.DatetimeIndex(np.atleast_1d(times) if np.ndim(times) == 0 else times)
+    if times.tz is None:
+        times = times.tz_localize(timezone, ambiguous=np.zeros(len(times), dtype=bool), nonexistent='shift_forward')
+    return times.tz_convert('UTC').as_unit('ns')
+
+#
+
+def solarPosition(times,latitude,longitude,timezone='America/New_York'):
+    '''
+
+    Parameters:
+        times : array of datetimes or anything pd.DatetimeIndex takes, without a timezone they are local times in timezone
+        latitude, longitude : degrees in WGS 1984, scalars or arrays broadcasting with times
+        timezone : timezone of naive times
+
+    Returns:
+        azimuth : compass degrees of the sun (clockwise, north = 0), the convention of the sunPositions list
+        altitude : degrees above the horizon, corrected for atmospheric refraction like the NOAA calculator
+        radiation : clear sky direct radiation in W/m^2, 0 when the sun is down
+
+    '''
+    times = utcTimes(times,timezone)
+    latitude = np.radians(np.asarray(latitude, dtype=float))
+    longitude = np.asarray(longitude, dtype=float)
+
+    # julian century from J2000
+    julianDay = times.asi8 / 86400e9 + 2440587.5
+    T = ( julianDay - 2451545.0 ) / 36525.0
+
+    meanLongitude = np.radians(( 280.46646 + T * ( 36000.76983 + T * 0.0003032 ) ) % 360)
+    meanAnomaly = np.radians(357.52911 + T * ( 35999.05029 - 0.0001537 * T ))
+    eccentricity = 0.016708634 - T * ( 0.000042037 + 0.0000001267 * T )
+    center = ( np.sin(meanAnomaly) * ( 1.914602 - T * ( 0.004817 + 0.000014 * T ) )
+             + np.sin(2 * meanAnomaly) * ( 0.019993 - 0.000101 * T )
+             + np.sin(3 * meanAnomaly) * 0.000289 )
+    omega = np.radians(125.04 - 1934.136 * T)
+    apparentLongitude = np.radians(np.degrees(meanLongitude) + center - 0.00569 - 0.00478 * np.sin(omega))
+    meanObliquity = 23 + ( 26 + ( 21.448 - T * ( 46.815 + T * ( 0.00059 - T * 0.001813 ) ) ) / 60 ) / 60
+    obliquity = np.radians(meanObliquity + 0.00256 * np.cos(omega))
+    declination = np.arcsin(np.sin(obliquity) * np.sin(apparentLongitude))
+
+    y = np.tan(obliquity / 2) ** 2
+    equationOfTime = 4 * np.degrees( y * np.sin(2 * meanLongitude)
+                                   - 2 * eccentricity * np.sin(meanAnomaly)
+                                   + 4 * eccentricity * y * np.sin(meanAnomaly) * np.cos(2 * meanLongitude)
+                                   - 0.5 * y * y * np.sin(4 * meanLongitude)
+                                   - 1.25 * eccentricity * eccentricity * np.sin(2 * meanAnomaly) )
+
+    # minutes past UTC midnight shifted to true solar time at the longitude
+    utcMinutes = ( times.asi8 % 86400000000000 ) / 60e9
+    trueSolarTime = ( utcMinutes + equationOfTime + 4 * longitude ) % 1440
+    hourAngle = np.radians(trueSolarTime / 4 - 180)
+
+    zenith = np.arccos(np.clip(np.sin(latitude) * np.sin(declination) + np.cos(latitude) * np.cos(declination) * np.cos(hourAngle), -1, 1))
+    azimuth = ( np.degrees(np.arctan2(np.sin(hourAngle), np.cos(hourAngle) * np.sin(latitude) - np.tan(declination) * np.cos(latitude))) + 180 ) % 360
+
+    # refraction in arc seconds, piecewise by elevation as in the NOAA spreadsheet
+    elevation = 90 - np.degrees(zenith)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tanElevation = np.tan(np.radians(elevation))
+        refraction = np.select(
+            [elevation > 85, elevation > 5, elevation > -0.575],
+            [0.0,
+             58.1 / tanElevation - 0.07 / tanElevation ** 3 + 0.000086 / tanElevation ** 5,
+             1735 + elevation * ( -518.2 + elevation * ( 103.4 + elevation * ( -12.79 + elevation * 0.711 ) ) )],
+            -20.772 / tanElevation)
+    altitude = elevation + refraction / 3600
+
+    radiation = clearSkyRadiation(times,altitude)
+    return azimuth, altitude, radiation
+
+#
+
+def clearSkyRadiation(times,altitude):
+    # direct beam W/m^2 on a surface facing the sun, pysolar's get_radiation_direct for arrays
+    dayOfYear = utcTimes(times).dayofyear.to_numpy()
+    flux = 1160 + 75 * np.sin(np.radians(( 360 / 365 ) * ( dayOfYear - 275 )))
+    opticalDepth = 0.174 + 0.035 * np.sin(np.radians(( 360 / 365 ) * ( dayOfYear - 100 )))
+    altitude = np.asarray(altitude, dtype=float)
+    up = ( altitude > 0 ) & ( altitude <= 90 )
+    # air mass only where the sun is up, below the horizon it goes negative and the exponent overflows
+    airMass = 1 / np.sin(np.radians(np.where(up, altitude, 90)))
+    radiation = np.where(up, flux * np.exp(-opticalDepth * airMass), 0.0)
+    return radiation
+
+#
+
+def cachedSolarPosition(times,latitude,longitude,cellDegrees=0.01,timezone='America/New_York'):
+    '''
+
+    Parameters:
+        times : array of times, see solarPosition
+        latitude, longitude : one location in degrees, snapped to a cellDegrees grid (0.01 degrees is about 1 km,
+            the sun moves well under a hundredth of a degree across it) so nearby trees share results
+        cellDegrees : size of the location grid results are cached on
+
+    Returns:
+        Pandas dataframe indexed like times (in UTC) with azimuth, altitude and radiation columns,
+        only times this process hasn't computed for the cell before are calculated
+
+    '''
+    cell = ( round(latitude / cellDegrees), round(longitude / cellDegrees) )
+    times = utcTimes(times,timezone)
+    cached = solarCache.get(cell)
+    missing = times if cached is None else times[cached.index.get_indexer(times.asi8) < 0]
+    if len(missing) > 0:
+        missing = missing.unique()
+        azimuth, altitude, radiation = solarPosition(missing, cell[0] * cellDegrees, cell[1] * cellDegrees)
+        computed = pd.DataFrame({'azimuth':azimuth, 'altitude':altitude, 'radiation':radiation}, index=missing.asi8)
+        cached = computed if cached is None else pd.concat([cached, computed])
+        solarCache[cell] = cached
+    rows = cached.index.get_indexer(times.asi8)
+    positions = pd.DataFrame(cached.to_numpy()[rows], index=times, columns=cached.columns)
+    return positions
+
+#
+
+def sunPositionsFor(dates,hours,latitude=NYC_LATITUDE,longitude=NYC_LONGITUDE,timezone='Etc/GMT+5'):
+    '''
+
+    Parameters:
+        dates : 'YYYY_MM_DD' strings
+        hours : 'HHMM' clock times, e.g. ['0800','0900']
+        latitude, longitude : where the sun is seen from, NYC by default
+        timezone : of the clock times, eastern standard time all year by default (no daylight saving) like the
+            hand copied NOAA positions, 'America/New_York' would follow the wall clock instead
+
+    Returns:
+        [az, amp, dateTimeString] list for every date and hour, the format the shading scripts take,
+        az in compass degrees and amp the refracted altitude, both rounded to 0.1 degree
+
+    '''
+    dateTimeStrings = ['{}_{}'.format(date,hour) for date in dates for hour in hours]
+    times = pd.to_datetime(dateTimeStrings, format='%Y_%m_%d_%H%M')
+    positions = cachedSolarPosition(times,latitude,longitude,timezone=timezone)
+    sunPositions = []
+    for azimuth, altitude, dateTimeString in zip(positions['azimuth'], positions['altitude'], dateTimeStrings):
+        sunPositions.append([round(float(azimuth),1), round(float(altitude),1), dateTimeString])
+    return sunPositions
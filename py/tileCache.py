@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:20:52 2026
+
+@author: joe
+"""
+
+# on-disk cache of preprocessed tiles so warm runs skip reading las files and removing buildings
+# entries are keyed by the content of every input file plus the parameters, so editing a las or geojson,
+# or changing a parameter, makes a new entry instead of serving a stale one
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from sharedPointCloud import writeColumns, readColumns
+
+#
+
+def fileDigest(filepath,blockSize=2**23):
+    # hash of a file's content, read in 8 MB blocks so big las files aren't loaded at once
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for block in iter(lambda: f.read(blockSize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+#
+
+def cacheKey(inputPaths,parameters):
+    '''
+
+    Parameters:
+        inputPaths : list of files the cached result is computed from
+        parameters : dict of everything else the result depends on, must be json serializable
+
+    Returns:
+        hex string naming the cache entry
+
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    for inputPath in inputPaths:
+        digest.update(fileDigest(inputPath).encode())
+    digest.update(json.dumps(parameters, sort_keys=True).encode())
+    return digest.hexdigest()
+
+#
+
+def cachedFrames(function,arguments,inputPaths,parameters,names,cacheFolder='tileCache/'):
+    '''
+
+    Parameters:
+        function : function returning a tuple of Pandas dataframes with numeric columns, e.g. lasPreprocess
+        arguments : list of arguments for function
+        inputPaths : files function reads, their content is part of the key
+        parameters : dict of settings the result depends on, bump a 'version' entry in it when function changes
+        names : one name per returned dataframe, used as the entry's sub-folders
+        cacheFolder : where entries are kept
+
+    Returns:
+        tuple of dataframes, read from the cache when an entry exists, otherwise computed and saved
+
+    '''
+    parameters = dict(parameters, function=function.__name__, arguments=arguments)
+    entry = os.path.join(cacheFolder, cacheKey(inputPaths,parameters))
+    if os.path.isdir(entry):
+        print('cache hit', entry)
+        return tuple(readColumns(os.path.join(entry,name), mmapMode=None) for name in names)
+
+    frames = function(*arguments)
+    # written to a scratch folder and renamed into place, so an interrupted run never leaves half an entry
+    os.makedirs(cacheFolder, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix='writing_', dir=cacheFolder)
+    for name, frame in zip(names, frames):
+        writeColumns(frame, os.path.join(scratch,name))
+    with open(os.path.join(scratch,'parameters.json'), 'w', encoding='utf-8') as f:
+        json.dump({'inputPaths':inputPaths, 'parameters':parameters}, f, indent=1)
+    try:
+        os.rename(scratch, entry)
+    except OSError:
+        # another process finished the same entry first
+        shutil.rmtree(scratch, ignore_errors=True)
+    return frames
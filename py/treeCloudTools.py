@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:02:17 2026
+
+@author: joe
+"""
+
+# splitting a lidar tile into single tree point clouds, shared by the treeMultiprocessing* and treeLAStoDeck scripts
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+#
+
+def canopyRadius(tree_dbh):
+    '''
+
+    Parameters:
+        tree_dbh : trunk diameter at breast height in inches, as stored in the street tree census, scalar or array
+
+    Returns:
+        canopy search radius in feet, an estimate of the crown from trunk area with a 1.5x margin of error/buffer
+
+    '''
+    tree_dbh_ft = np.asarray(tree_dbh, dtype=float) / 12
+    tree_dbh_m = tree_dbh_ft / 3.28
+    trunk_area_sq_m = 3.1415926 * ( ( tree_dbh_m / 2 ) ** 2 )
+    canopy_diameter_m = 7 + 28.2 * trunk_area_sq_m
+    canopy_radius_m = canopy_diameter_m / 2
+    return canopy_radius_m * 1.5 * 3.28
+
+#
+
+def assignPointsToTrees(pointsXY,trunksXY):
+    '''
+
+    Parameters:
+        pointsXY : (N,2) array of point cloud x,y in state plane feet
+        trunksXY : (T,2) array of tree trunk x,y in the same units
+
+    Returns:
+        distances : distance from each point to its nearest trunk
+        nearest : row index into trunksXY of each point's nearest trunk, i.e. the voronoi cell it falls in
+
+    '''
+    distances, nearest = cKDTree(trunksXY).query(pointsXY)
+    return distances, nearest
+
+#
+
+def segmentTreeRows(lidar_df,trees_df):
+    '''
+
+    Parameters:
+        lidar_df : Pandas dataframe of the tile with 'X' and 'Y' columns in state plane feet
+        trees_df : Pandas dataframe of the street tree census rows in the tile ('tree_id','tree_dbh','x_sp','y_sp')
+
+    Returns:
+        treeRows : list of [tree, rows] pairs, tree being the census row as a Pandas series and rows the
+            positions (for .iloc) of the points inside its voronoi cell and canopy radius, for every tree with points
+
+    '''
+    trees_df = trees_df.reset_index(drop=True)
+    if len(trees_df) == 0 or len(lidar_df) == 0:
+        return []
+    distances, nearest = assignPointsToTrees(lidar_df[['X','Y']].to_numpy(dtype=float),trees_df[['x_sp','y_sp']].to_numpy(dtype=float))
+    # distance from trunk filter drops points outside the estimated canopy of the tree they were assigned to
+    rows = np.flatnonzero( distances < canopyRadius(trees_df['tree_dbh'].to_numpy())[nearest] )
+    nearest = nearest[rows]
+    # sort once by tree so every tree's points are one contiguous run
+    order = np.argsort(nearest, kind='stable')
+    rows, nearest = rows[order], nearest[order]
+    treeIndices, starts = np.unique(nearest, return_index=True)
+    stops = np.append(starts[1:], len(rows))
+    treeRows = []
+    for treeIndex, start, stop in zip(treeIndices, starts, stops):
+        treeRows.append([trees_df.iloc[treeIndex], rows[start:stop]])
+    return treeRows
+
+#
+
+def segmentTreeClouds(lidar_df,trees_df):
+    '''
+
+    Same as segmentTreeRows but with each tree's points as their own dataframe, for running in a single process.
+
+    '''
+    treeClouds = []
+    for tree, rows in segmentTreeRows(lidar_df,trees_df):
+        treeClouds.append([tree, lidar_df.iloc[rows]])
+    return treeClouds
+
+#
+
+# binary tree point clouds for the deck.gl viewer, a fixed 32 byte little endian header then one float32 row per point,
+# loaded in the browser as a single Float32Array and handed to PointCloudLayer as binary attributes, no JSON to write or parse
+DECK_MAGIC = b'TPC1'
+DECK_COLUMNS = ['east', 'north', 'Z', 'intens', 'return_number', 'number_of_returns']
+DECK_HEADER = np.dtype([('magic','S4'), ('version','<u4'), ('count','<u4'), ('columns','<u4'), ('lon','<f8'), ('lat','<f8')])
+
+#
+
+def deckRows(lidar_df,treeX,treeY):
+    '''
+
+    Parameters:
+        lidar_df : Pandas dataframe of a tree's points, X,Y in state plane feet, Z already in meters above the ground,
+            intens, return_number and number_of_returns as clipTreeCloud prepares them
+        treeX, treeY : trunk location in state plane feet
+
+    Returns:
+        (N,6) float32 array of DECK_COLUMNS, east and north are offsets from the trunk in meters so deck.gl can use them
+        as METER_OFFSETS positions around the trunk, small enough that float32 keeps them to well under a millimeter
+
+    '''
+    rows = np.empty((len(lidar_df), len(DECK_COLUMNS)), dtype=np.float32)
+    rows[:,0] = ( lidar_df['X'].to_numpy(dtype=float) - treeX ) / 3.28
+    rows[:,1] = ( lidar_df['Y'].to_numpy(dtype=float) - treeY ) / 3.28
+    for i, column in enumerate(['Z', 'intens', 'return_number', 'number_of_returns']):
+        rows[:,i+2] = lidar_df[column].to_numpy(dtype=float)
+    return rows
+
+#
+
+def writeDeckBinary(filepath,rows,lon,lat):
+    '''
+
+    Parameters:
+        filepath : output path, by convention <tree_id>.bin next to where the .json would go
+        rows : (N,6) array from deckRows
+        lon, lat : trunk location in WGS 1984, the origin the offsets are relative to
+
+    Returns:
+        none, writes the header followed by the rows as float32
+
+    '''
+    rows = np.ascontiguousarray(rows, dtype='<f4')
+    header = np.zeros(1, dtype=DECK_HEADER)
+    header[0] = (DECK_MAGIC, 1, rows.shape[0], rows.shape[1], lon, lat)
+    with open(filepath, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(rows.tobytes())
+
+#
+
+def parseDeckHeader(buffer,filepath):
+    header = np.frombuffer(buffer, dtype=DECK_HEADER, count=1)[0]
+    if header['magic'] != DECK_MAGIC:
+        raise ValueError('{} is not a binary tree point cloud'.format(filepath))
+    return {'count':int(header['count']), 'columns':int(header['columns']), 'lon':float(header['lon']), 'lat':float(header['lat'])}
+
+#
+
+def readDeckHeader(filepath):
+    # point count and trunk location of a file written by writeDeckBinary, only the 32 header bytes are read
+    with open(filepath, 'rb') as f:
+        buffer = f.read(DECK_HEADER.itemsize)
+    return parseDeckHeader(buffer,filepath)
+
+#
+
+def readDeckBinary(filepath):
+    # header dict and (N,columns) float32 rows of a file written by writeDeckBinary
+    with open(filepath, 'rb') as f:
+        buffer = f.read()
+    header = parseDeckHeader(buffer,filepath)
+    rows = np.frombuffer(buffer, dtype='<f4', offset=DECK_HEADER.itemsize, count=header['count']*header['columns'])
+    rows = rows.reshape(header['count'], header['columns'])
+    return header, rows
@@ -11,14 +11,62 @@ import pandas as pd
 import os
 import json
 import itertools
+from shadeStore import readShadeStore, shadeCounts
+from treeCloudTools import readDeckHeader
+
+SUMMARY_COLUMNS = [
+    'treeid',
+    'lidarTile',
+    'year',
+    'month',
+    'day',
+    'hour',
+    'inShadeCount',
+    'shadingGroundCount',
+    'shadingBuildingCount',
+    'totalPointsCount',
+    'inShadeProportion',
+    'shadingGroundProportion',
+    'shadingBuildingProportion'
+    ]
+
+# the columns that name one summary row, a tree at one timestamp
+SUMMARY_KEY = ['treeid','lidarTile','year','month','day','hour']
 
 def countDataFrame(treeJSONpath):
-    if os.path.exists(treeJSONpath):
-        with open(treeJSONpath) as f:
-            treePoints = json.load(f)
-        return len(treePoints)
-    else:
+    #number of points in a tree file without parsing it, 0 if the file doesn't exist
+    #a .json tree is a list of [lat, lon, Z, ...] rows, so every '[' after the outer one starts a point
+    #a .bin tree (writeDeckBinary) has the count in its header
+    if not os.path.exists(treeJSONpath):
         return 0
+    if treeJSONpath.endswith('.bin'):
+        return readDeckHeader(treeJSONpath)['count']
+    with open(treeJSONpath, 'rb') as f:
+        brackets = sum(block.count(b'[') for block in iter(lambda: f.read(2**20), b''))
+    return max(brackets - 1, 0)
+
+def summaryFromShadeStores(storeFolder,since=None):
+    #the treeShadeSummaryStatsV2 table straight from the per tile shade stores, a group-by over their columns instead of opening a json per count
+    #since : modification time, only stores written after it are read, None reads them all
+    #stores are read oldest first, so where a tile's merged store and a part left next to it both have a row the newer one is kept
+    paths = sorted(( os.path.join(storeFolder,filename) for filename in os.listdir(storeFolder) if filename.endswith('.npz') ), key=os.path.getmtime)
+    summaries = []
+    for path in paths:
+        if since is None or os.path.getmtime(path) > since:
+            summaries.append(shadeCounts(readShadeStore(path)))
+    if len(summaries) == 0:
+        return pd.DataFrame({column:[] for column in SUMMARY_COLUMNS}, columns=SUMMARY_COLUMNS)
+    summaryDF = pd.concat(summaries, ignore_index=True)
+    summaryDF = summaryDF.rename(columns={'shadingFacadeCount':'shadingBuildingCount'})
+    # tree ids as text like the ones from file names, so rows match the ones read back from the csv
+    summaryDF['treeid'] = summaryDF['treeid'].astype(str)
+    timestamp = summaryDF['timestamp'].str.split('_', expand=True)
+    summaryDF['year'], summaryDF['month'], summaryDF['day'], summaryDF['hour'] = timestamp[0], timestamp[1], timestamp[2], timestamp[3]
+    summaryDF = summaryDF.drop_duplicates(SUMMARY_KEY, keep='last').reset_index(drop=True)
+    total = summaryDF['totalPointsCount'].where(summaryDF['totalPointsCount'] > 0)
+    for condition in ['inShade','shadingGround','shadingBuilding']:
+        summaryDF['{}Proportion'.format(condition)] = ( summaryDF['{}Count'.format(condition)] / total ).fillna(0)
+    return summaryDF[SUMMARY_COLUMNS]
     
     
     
@@ -28,15 +76,19 @@ def countDataFrame(treeJSONpath):
 tree_csv = 'csv/2015StreetTreesCensus_TREES.csv'
 treedf = pd.read_csv(tree_csv)
 
+# per tile shade stores written by the shading pipeline, used instead of the per tree json files when there are any
+shadeStoreFolder = 'shadeResults/'
+useShadeStores = os.path.isdir(shadeStoreFolder) and any(filename.endswith('.npz') for filename in os.listdir(shadeStoreFolder))
+
 treeids = []
 tileids = {}
 
 # find trees in dataset
-for filename in os.listdir('shadeShadingShadedTrees/'):
+for filename in ( [] if useShadeStores else os.listdir('shadeShadingShadedTrees/') ):
     if filename.endswith('.json'):
         treeid = int(filename.split('_')[0])
         tileid = int(filename.split('_')[5].strip('tile'))
-        if treeid in treeids:
+        if treeid in tileids:
             continue
         else:
             treeids.append(treeid)
@@ -70,90 +122,74 @@ treedf = treedf[treedf['tree_id'].isin(treeids)]
 
 ###############################################################################
 
-summaryDictSchema = {
-    'treeid':[],
-    'lidarTile':[],
-    'year':[],
-    'month':[],
-    'day':[],
-    'hour':[],
-    'inShadeCount':[],
-    'shadingGroundCount':[],
-    'shadingBuildingCount':[],
-    'totalPointsCount':[],
-    'inShadeProportion':[],
-    'shadingGroundProportion':[],
-    'shadingBuildingProportion':[]
-    }
-
-summaryDF = pd.DataFrame.from_dict(summaryDictSchema)
-
-for filename in os.listdir('shadeShadingShadedTrees/'):
-    if filename.endswith('_shadingFacade.json'):
-        newLineSummaryDict = summaryDictSchema
-        
-        treeid = filename.split('_')[0]
-        year   = filename.split('_')[1]
-        month  = filename.split('_')[2]
-        day    = filename.split('_')[3]
-        hour   = filename.split('_')[4]
-        tile   = filename.split('_')[5].strip('tile')
-        
-        inshadefilename = 'shadeShadingShadedTrees/{}_{}_{}_{}_{}_tile{}_inShade.json'.format(treeid,year,month,day,hour,tile)
-        shadinggroundfilename = 'shadeShadingShadedTrees/{}_{}_{}_{}_{}_tile{}_shadingGround.json'.format(treeid,year,month,day,hour,tile)
-        shadingbuildingfilename = 'shadeShadingShadedTrees/{}_{}_{}_{}_{}_tile{}_shadingFacade.json'.format(treeid,year,month,day,hour,tile)
+def summaryFromTreeFiles(treeFolder,since=None):
+    '''
+
+    Parameters:
+        treeFolder : folder of {tree}_{YYYY}_{MM}_{DD}_{HHMM}_tile{n}_{condition}.json (or .bin) files from treeMultiprocessingFromCSV
+        since : modification time (seconds since the epoch), only trees and timestamps with a file changed after it are counted,
+            None counts everything
+
+    Returns:
+        Pandas dataframe of SUMMARY_COLUMNS, one row per tree and timestamp with a shadingFacade file,
+        built from column lists in one pass
+
+    '''
+    summaryLists = {column:[] for column in SUMMARY_COLUMNS}
+    
+    for filename in os.listdir(treeFolder):
+        if not ( filename.endswith('_shadingFacade.json') or filename.endswith('_shadingFacade.bin') ):
+            continue
+        treeid, year, month, day, hour, tile = filename.split('_')[:6]
+        tile = tile.strip('tile')
+        extension = os.path.splitext(filename)[1]
         
-        inShadeCount = countDataFrame(inshadefilename)
-        shadingGroundCount = countDataFrame(shadinggroundfilename)
-        shadingBuildingCount = countDataFrame(shadingbuildingfilename)
+        paths = ['{}{}_{}_{}_{}_{}_tile{}_{}{}'.format(treeFolder,treeid,year,month,day,hour,tile,condition,extension) for condition in ['inShade','shadingGround','shadingFacade']]
+        if since is not None and all( not os.path.exists(path) or os.path.getmtime(path) <= since for path in paths ):
+            continue
         
+        inShadeCount, shadingGroundCount, shadingBuildingCount = [countDataFrame(path) for path in paths]
         totalPointsCount = inShadeCount + shadingGroundCount + shadingBuildingCount
         
+        row = [treeid, tile, year, month, day, hour, inShadeCount, shadingGroundCount, shadingBuildingCount, totalPointsCount]
         if totalPointsCount > 0:
-            inShadeProportion = inShadeCount / totalPointsCount
-            shadingGroundProportion = shadingGroundCount / totalPointsCount
-            shadingBuildingProportion = shadingBuildingCount / totalPointsCount
+            row += [inShadeCount / totalPointsCount, shadingGroundCount / totalPointsCount, shadingBuildingCount / totalPointsCount]
         else:
-            inShadeProportion = 0
-            shadingGroundProportion = 0
-            shadingBuildingProportion = 0
-        
-        
-        
-        newLineSummaryDict = {
-            'treeid':[treeid],
-            'lidarTile':[tile],
-            'year':[year],
-            'month':[month],
-            'day':[day],
-            'hour':[hour],
-            'inShadeCount':[inShadeCount],
-            'shadingGroundCount':[shadingGroundCount],
-            'shadingBuildingCount':[shadingBuildingCount],
-            'totalPointsCount':[totalPointsCount],
-            'inShadeProportion':[inShadeProportion],
-            'shadingGroundProportion':[shadingGroundProportion],
-            'shadingBuildingProportion':[shadingBuildingProportion]
-            }
-        
-        
-        newLineDF = pd.DataFrame.from_dict(newLineSummaryDict)
-        summaryDF = pd.concat([summaryDF,newLineDF])
-        summaryDF = summaryDF[[
-            'treeid',
-            'lidarTile',
-            'year',
-            'month',
-            'day',
-            'hour',
-            'inShadeCount',
-            'shadingGroundCount',
-            'shadingBuildingCount',
-            'totalPointsCount',
-            'inShadeProportion',
-            'shadingGroundProportion',
-            'shadingBuildingProportion'
-            ]]
-        
-        summaryDF.to_csv('treeShadeSummaryStatsV2.csv')
-        
+            row += [0, 0, 0]
+        for column, value in zip(SUMMARY_COLUMNS, row):
+            summaryLists[column].append(value)
+    
+    summaryDF = pd.DataFrame(summaryLists, columns=SUMMARY_COLUMNS)
+    return summaryDF
+
+def updateSummary(treeFolder,summaryPath,resume=True,storeFolder=None):
+    '''
+
+    Parameters:
+        treeFolder : folder of per tree result files, see summaryFromTreeFiles
+        summaryPath : summary csv, read and updated in place when resuming
+        resume : only recount trees and timestamps with files newer than summaryPath, keeping the other rows as they are
+        storeFolder : folder of per tile shade stores, counted instead of treeFolder when given (see summaryFromShadeStores),
+            resuming then only rereads the stores written after summaryPath
+
+    Returns:
+        Pandas dataframe of the whole summary, also written to summaryPath once
+
+    '''
+    if resume and os.path.exists(summaryPath):
+        since = os.path.getmtime(summaryPath)
+        oldDF = pd.read_csv(summaryPath, index_col=0, dtype={'treeid':str, 'lidarTile':str, 'year':str, 'month':str, 'day':str, 'hour':str})
+        newDF = summaryFromTreeFiles(treeFolder,since) if storeFolder is None else summaryFromShadeStores(storeFolder,since)
+        # rows recounted from newer files replace their old version
+        oldDF = oldDF.set_index(SUMMARY_KEY)
+        oldDF = oldDF[ ~oldDF.index.isin(newDF.set_index(SUMMARY_KEY).index) ].reset_index()
+        # an empty recount left out, concatenating it would turn the count columns into floats
+        summaryDF = pd.concat([oldDF, newDF] if len(newDF) > 0 else [oldDF], ignore_index=True)[SUMMARY_COLUMNS]
+        print('{} summary rows recounted, {} kept from {}'.format(len(newDF), len(oldDF), summaryPath))
+    else:
+        summaryDF = summaryFromTreeFiles(treeFolder) if storeFolder is None else summaryFromShadeStores(storeFolder)
+    summaryDF.to_csv(summaryPath)
+    return summaryDF
+
+
+summaryDF = updateSummary('shadeShadingShadedTrees/','treeShadeSummaryStatsV2.csv',storeFolder=shadeStoreFolder if useShadeStores else None)